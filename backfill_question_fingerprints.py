@@ -0,0 +1,45 @@
+import asyncio
+
+from sqlalchemy import Table, select, update, bindparam, and_
+
+from database.database import async_session_maker
+from src.llm_service.models import answer_question_system, test_system
+from src.llm_service.utils import question_fingerprint
+from config.logs import doc_info
+
+
+BATCH_SIZE = 5000
+
+
+async def backfill_table(table: Table) -> int:
+    stmt = update(table).where(table.c.id == bindparam('row_id')).values(question_fingerprint=bindparam('fingerprint'))
+    last_id, total = 0, 0
+    while True:
+        async with async_session_maker() as session:
+            rows = (await session.execute(
+                select(table.c.id, table.c.question)
+                .where(and_(table.c.id > last_id, table.c.question_fingerprint.is_(None)))
+                .order_by(table.c.id)
+                .limit(BATCH_SIZE)
+            )).fetchall()
+            if not rows:
+                return total
+
+            await session.execute(
+                stmt, [{'row_id': row.id, 'fingerprint': question_fingerprint(row.question)} for row in rows]
+            )
+            await session.commit()
+
+        last_id = rows[-1].id
+        total += len(rows)
+        doc_info.info(f'{table.name}: {total} question fingerprints backfilled')
+
+
+async def backfill_question_fingerprints():
+    for table in (answer_question_system, test_system):
+        total = await backfill_table(table)
+        doc_info.info(f'{table.name}: backfill finished, {total} rows updated')
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill_question_fingerprints())
@@ -0,0 +1,134 @@
+"""
+Local stand-in for gigachat_api, returning the response shapes this service relies on.
+
+    FAKE_LLM_LATENCY=0.5 FAKE_LLM_FAILURE_RATE=0.01 uvicorn benchmarks.fake_gigachat_api:app --port 8080
+
+and start the service with LLM_API_URL=http://localhost:8080.
+
+FAKE_LLM_LATENCY     mean latency of generation endpoints in seconds (default 0.5)
+FAKE_LLM_JITTER      uniform +- jitter in seconds (default 0.1)
+FAKE_LLM_FAILURE_RATE share of requests answered with HTTP 500 (default 0)
+FAKE_LLM_DOCS        comma separated doc names known at start (default: both contest docs)
+"""
+import asyncio
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+LATENCY = float(os.environ.get('FAKE_LLM_LATENCY', 0.5))
+JITTER = float(os.environ.get('FAKE_LLM_JITTER', 0.1))
+FAILURE_RATE = float(os.environ.get('FAKE_LLM_FAILURE_RATE', 0))
+DOCS = set(os.environ.get('FAKE_LLM_DOCS', 'DATAPK_ITM_VERSION_1_7,DATAPK_VERSION_2_1').split(','))
+
+app = FastAPI(title="fake gigachat_api")
+
+
+async def generation_delay() -> float:
+    delay = max(LATENCY + random.uniform(-JITTER, JITTER), 0)
+    await asyncio.sleep(delay)
+    return round(delay, 3)
+
+
+@app.middleware('http')
+async def inject_failures(request: Request, call_next):
+    if random.random() < FAILURE_RATE:
+        return JSONResponse(status_code=500, content={'detail': 'injected failure'})
+    return await call_next(request)
+
+
+@app.post('/process_questions')
+async def process_questions(data: dict):
+    delay = await generation_delay()
+    return {
+        'result': {'question': data['question'], 'answer': f"Fake answer from {data['filename']}"},
+        'prompt_path': 'prompts/fake_qa.txt',
+        'tokens': random.randint(500, 1500),
+        'embedding_tokens': random.randint(10, 50),
+        'total_time': round(delay * 1.1, 3),
+        'metrics': {'context_relevance': round(random.random(), 2)},
+        'gigachat_time': delay,
+        'from_cache': False
+    }
+
+
+@app.post('/process_questions_stream')
+async def process_questions_stream(data: dict):
+    answer = f"Fake answer from {data['filename']}"
+    tokens = answer.split(' ')
+
+    async def lines():
+        start = time.perf_counter()
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(max(LATENCY + random.uniform(-JITTER, JITTER), 0) / len(tokens))
+            yield json.dumps({'token': token if i == 0 else f' {token}'}) + '\n'
+        delay = round(time.perf_counter() - start, 3)
+        yield json.dumps({
+            'result': {'question': data['question'], 'answer': answer},
+            'prompt_path': 'prompts/fake_qa.txt',
+            'tokens': random.randint(500, 1500),
+            'embedding_tokens': random.randint(10, 50),
+            'total_time': round(delay * 1.1, 3),
+            'metrics': {'context_relevance': round(random.random(), 2)},
+            'gigachat_time': delay,
+            'from_cache': False
+        }) + '\n'
+
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+
+@app.post('/process_data')
+async def process_data(data: dict):
+    delay = await generation_delay()
+    right = random.randint(1, 4)
+    test = {f'{i} option': f'Option {i}' for i in range(1, 5)}
+    return {
+        'result': {'result': {
+            'question': f"Fake test question {random.randint(1, 10 ** 6)} about {data['filename']}",
+            **test,
+            'right answer': test[f'{right} option'],
+            'generation_attemps': 1
+        }},
+        'prompt_path': 'prompts/fake_test.txt',
+        'tokens': random.randint(800, 2000),
+        'total_time': round(delay * 1.1, 3),
+        'gigachat_time': delay
+    }
+
+
+@app.post('/process_doc')
+async def process_doc(request: Request):
+    form = await request.form()
+    filename = form['file'].filename
+    await generation_delay()
+    DOCS.add(filename.rsplit('.', 1)[0])
+    return {'result': 'success', 'info': {'chunk_size': 512, 'embedding_model': 'fake-embeddings'}}
+
+
+@app.post('/process_add_data')
+async def process_add_data(request: Request):
+    await request.form()
+    await generation_delay()
+    return {'result': 'success'}
+
+
+@app.post('/process_delete_doc')
+async def process_delete_doc(data: dict):
+    DOCS.discard(data['doc_name'])
+    return {'result': 'success'}
+
+
+@app.post('/process_change_doc_name')
+async def process_change_doc_name(data: dict):
+    DOCS.discard(data['cur_name'])
+    DOCS.add(data['new_name'])
+    return {'result': 'success'}
+
+
+@app.post('/process_get_actual_doc_list')
+async def process_get_actual_doc_list():
+    return sorted(DOCS)
@@ -0,0 +1,135 @@
+"""
+Load test for the hot endpoints, run against the service backed by benchmarks.fake_gigachat_api
+and a local Postgres (DB_* env, used to seed verified benchmark users):
+
+    python -m benchmarks.load_test --base-url http://localhost:8000 --users 50 --concurrency 50 --duration 30
+
+Scenarios: get_answer, get_test, check_test (latency of check_test after a fresh get_test),
+leaderboard (public board) and leaderboard_me. Reports requests per second and p50/p95/p99.
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+import httpx
+from fastapi_users.password import PasswordHelper
+from sqlalchemy import insert, select
+
+from database.database import async_session_maker
+from src.auth.models import user
+from src.llm_service.contest import CONTEST_DATAPK
+
+
+PASSWORD = 'benchmark-password'
+SCENARIOS = ('get_answer', 'get_test', 'check_test', 'leaderboard', 'leaderboard_me')
+
+
+async def seed_users(count: int) -> list[str]:
+    emails = [f'bench{i}@example.com' for i in range(count)]
+    hashed_password = PasswordHelper().hash(PASSWORD)
+    async with async_session_maker() as session:
+        existing = set((await session.execute(select(user.c.email).where(user.c.email.in_(emails)))).scalars())
+        new_users = [
+            {'name': 'Bench', 'surname': str(i), 'email': email, 'hashed_password': hashed_password,
+             'is_active': True, 'is_superuser': False, 'is_verified': True}
+            for i, email in enumerate(emails) if email not in existing
+        ]
+        if new_users:
+            await session.execute(insert(user).values(new_users))
+            await session.commit()
+    return emails
+
+
+async def login(client: httpx.AsyncClient, email: str) -> dict:
+    response = await client.post('/auth/jwt/login', data={'username': email, 'password': PASSWORD})
+    response.raise_for_status()
+    return {'Cookie': f"bonds={response.cookies['bonds']}"}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, start: float, response: httpx.Response | None) -> None:
+        if response is None or response.status_code >= 400:
+            self.errors[name] += 1
+        else:
+            self.latencies[name].append(time.perf_counter() - start)
+
+    def report(self, duration: float) -> None:
+        print(f"{'scenario':<16}{'ok':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name in SCENARIOS:
+            latencies = sorted(self.latencies[name])
+            if not latencies and not self.errors[name]:
+                continue
+
+            def percentile(p: float) -> float:
+                return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0
+
+            print(f'{name:<16}{len(latencies):>8}{self.errors[name]:>8}{len(latencies) / duration:>10.1f}'
+                  f'{percentile(0.5):>10.1f}{percentile(0.95):>10.1f}{percentile(0.99):>10.1f}')
+
+
+async def timed(stats: Stats, name: str, request) -> httpx.Response | None:
+    start = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError:
+        response = None
+    stats.record(name, start, response)
+    return response
+
+
+async def worker(client: httpx.AsyncClient, headers: dict, args, stats: Stats, deadline: float) -> None:
+    questions = [f'Benchmark question number {i}?' for i in range(args.distinct_questions)]
+    while time.perf_counter() < deadline:
+        scenario = random.choice(args.scenarios)
+        if scenario == 'get_answer':
+            params = {'filename': args.doc, 'question': random.choice(questions)}
+            await timed(stats, scenario, client.post('/get_answer', params=params, headers=headers))
+        elif scenario in ('get_test', 'check_test'):
+            response = await timed(stats, 'get_test', client.post('/get_test', params={'filename': args.doc},
+                                                                   headers=headers))
+            if scenario == 'check_test' and response is not None and response.status_code == 200:
+                body = response.json()
+                check = {'request_id': body['request_id'], 'selected_option': random.choice(
+                    [body['result'][f'{i} option'] for i in range(1, 5)]
+                )}
+                await timed(stats, 'check_test', client.post('/check_test', json=check, headers=headers))
+        elif scenario == 'leaderboard':
+            await timed(stats, scenario, client.get(f'/contest/leaderboard/{args.doc}', headers=headers))
+        elif scenario == 'leaderboard_me':
+            await timed(stats, scenario, client.get('/contest/leaderboard_me', headers=headers))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--base-url', default='http://localhost:8000')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--doc', default=CONTEST_DATAPK)
+    parser.add_argument('--distinct-questions', type=int, default=20)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    args = parser.parse_args()
+
+    emails = await seed_users(args.users)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=300) as client:
+        sessions = await asyncio.gather(*(login(client, email) for email in emails))
+
+        stats = Stats()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            worker(client, sessions[i % len(sessions)], args, stats, deadline)
+            for i in range(args.concurrency)
+        ))
+        stats.report(time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Event-loop lag while a burst of logins verifies bcrypt passwords, with verification run inline
+on the loop (as before) and in the AsyncPasswordHelper thread pool. Needs no database:
+
+    python -m benchmarks.login_storm --logins 50 --concurrency 50
+
+A ticker task sleeps --tick seconds in a loop; lag is how late it wakes up. Also reports how
+long the whole storm took.
+"""
+import argparse
+import asyncio
+import time
+
+from src.auth.password import AsyncPasswordHelper
+
+
+PASSWORD = 'benchmark-password'
+
+
+async def ticker(tick: float, lags: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(time.perf_counter() - start - tick)
+
+
+async def login_inline(helper: AsyncPasswordHelper, hashed_password: str) -> None:
+    helper.verify_and_update(PASSWORD, hashed_password)
+    await asyncio.sleep(0)
+
+
+async def login_executor(helper: AsyncPasswordHelper, hashed_password: str) -> None:
+    await helper.verify_and_update_async(PASSWORD, hashed_password)
+
+
+async def storm(login, helper: AsyncPasswordHelper, hashed_password: str, args) -> tuple[float, list[float]]:
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(args.tick, lags, stop))
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            await login(helper, hashed_password)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    return elapsed, sorted(lags)
+
+
+def report(name: str, elapsed: float, lags: list[float]) -> None:
+    def percentile(p: float) -> float:
+        return lags[min(int(len(lags) * p), len(lags) - 1)] * 1000 if lags else 0
+
+    print(f'{name:<10}{elapsed:>10.2f}{percentile(0.5):>10.1f}{percentile(0.99):>10.1f}'
+          f'{(lags[-1] * 1000 if lags else 0):>10.1f}')
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--tick', type=float, default=0.01)
+    args = parser.parse_args()
+
+    helper = AsyncPasswordHelper(max_workers=args.workers)
+    hashed_password = helper.hash(PASSWORD)
+
+    print(f"{'mode':<10}{'total s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}  (event-loop lag)")
+    report('inline', *(await storm(login_inline, helper, hashed_password, args)))
+    report('executor', *(await storm(login_executor, helper, hashed_password, args)))
+    helper.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
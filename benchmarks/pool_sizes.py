@@ -0,0 +1,75 @@
+"""
+Throughput of a /check_test-like transaction at different connection pool sizes. Point DB_* at
+a database migrated to head (the queries only read):
+
+    python -m benchmarks.pool_sizes --pool-sizes 5 10 20 40 --concurrency 100 --duration 15
+
+Every worker runs a short transaction (test_system lookup by request_id, a request_statistic
+lookup and a --think-ms server-side pause standing in for the rest of the work) in a loop.
+Reports transactions per second, p95 latency and the mean/max pool checkout wait.
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.database import create_engine
+from src.llm_service.models import test_system, request_statistic
+
+
+async def transaction(session_maker, request_id: int, think: float) -> None:
+    async with session_maker() as session:
+        await session.execute(select(test_system.c.right_answer).where(test_system.c.request_id == request_id))
+        await session.execute(select(request_statistic.c.doc_name).where(request_statistic.c.id == request_id))
+        if think:
+            await session.execute(text('SELECT pg_sleep(:seconds)'), {'seconds': think})
+        await session.commit()
+
+
+async def run(pool_size: int, args) -> None:
+    engine = create_engine(pool_size=pool_size, max_overflow=0, pool_timeout=60)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        max_id = (await session.execute(select(func.coalesce(func.max(request_statistic.c.id), 1)))).scalar()
+
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(i: int):
+        request_id = 1 + i * 7919 % max_id
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await transaction(session_maker, request_id, args.think_ms / 1000)
+            latencies.append(time.perf_counter() - start)
+            request_id = 1 + (request_id + 7919) % max_id
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    stats = engine.pool.stats()
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    print(f'{pool_size:>10}{len(latencies) / elapsed:>10.1f}{p95:>10.1f}'
+          f"{stats['wait_avg_ms']:>14.2f}{stats['wait_max_ms']:>14.2f}")
+    await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[5, 10, 20, 40])
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--think-ms', type=float, default=2)
+    args = parser.parse_args()
+
+    print(f"{'pool size':>10}{'tx/s':>10}{'p95 ms':>10}{'wait avg ms':>14}{'wait max ms':>14}")
+    for pool_size in args.pool_sizes:
+        await run(pool_size, args)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
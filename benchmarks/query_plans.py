@@ -0,0 +1,221 @@
+"""
+EXPLAIN ANALYZE suite for the hot statistics and contest queries. Point DB_* at a scratch
+database migrated to head, seed it once and run the suite:
+
+    python -m benchmarks.query_plans --seed --rows 3000000 --users 2000
+    python -m benchmarks.query_plans --runs 5
+
+Every query is checked against its plan: a Seq Scan on one of the large tables is reported as a
+regression and the script exits with status 1, so it can run in CI after migrations change.
+--verbose prints the full plans.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, and_, text, exists
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from database.database import async_session_maker
+from src.auth.models import user
+from src.llm_service.models import (request_statistic, answer_question_system, test_system, feedback, contest)
+from src.llm_service.utils import question_fingerprint
+
+
+SEED_EMAIL = 'plan%@example.com'
+DOCS = ('DATAPK_ITM_VERSION_1_7', 'DATAPK_VERSION_2_1', 'plan_doc_a', 'plan_doc_b', 'plan_rare_doc')
+LARGE_TABLES = {'request_statistic', 'answer_question_system', 'test_system', 'feedback', 'contest'}
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, 'postgresql')
+def compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+
+async def seed(rows: int, users: int) -> None:
+    async with async_session_maker() as session:
+        # the bulk inserts run far longer than DB_STATEMENT_TIMEOUT allows
+        await session.execute(text('SET LOCAL statement_timeout = 0'))
+        existing = (await session.execute(
+            select(func.count()).select_from(user).where(user.c.email.like(SEED_EMAIL))
+        )).scalar()
+        await session.execute(text("""
+            INSERT INTO "user" (name, surname, email, hashed_password, is_active, is_superuser, is_verified)
+            SELECT 'Plan', g::text, 'plan' || g || '@example.com', '-', true, false, true
+            FROM generate_series(:start, :stop) AS g
+        """), {'start': existing + 1, 'stop': users})
+        first_id = (await session.execute(select(func.coalesce(func.max(request_statistic.c.id), 0)))).scalar()
+
+        # a month of requests, 1% of them on plan_rare_doc, a third are tests
+        await session.execute(text("""
+            WITH users AS (SELECT array_agg(id ORDER BY id) AS ids FROM "user" WHERE email LIKE :email)
+            INSERT INTO request_statistic (user_id, received_at, operation, prompt_path, doc_name, tokens,
+                                           embedding_tokens, total_time, gigachat_time, from_cache)
+            SELECT users.ids[1 + g % array_length(users.ids, 1)],
+                   now() - (g % 2592000) * interval '1 second',
+                   CASE WHEN g % 3 = 0 THEN 'get_test' ELSE 'get_answer' END,
+                   'prompts/plan.txt',
+                   CASE WHEN g % 100 = 0 THEN 'plan_rare_doc' ELSE CAST(:docs AS text[])[1 + g % 4] END,
+                   500 + g % 1000, g % 50, 1.5, 1.2, g % 5 = 0
+            FROM users, generate_series(1, :rows) AS g
+        """), {'email': SEED_EMAIL, 'docs': list(DOCS[:4]), 'rows': rows})
+        await session.execute(text("""
+            INSERT INTO answer_question_system (request_id, question, answer, metrics, question_fingerprint)
+            SELECT id, 'Plan question ' || id % 1000 || '?', 'Plan answer', NULL, md5('planquestion' || id % 1000)
+            FROM request_statistic WHERE id > :first_id AND operation = 'get_answer'
+        """), {'first_id': first_id})
+        await session.execute(text("""
+            INSERT INTO test_system (request_id, question, option_1, option_2, option_3, option_4, right_answer,
+                                     generation_attempts, answered_at, question_fingerprint)
+            SELECT id, 'Plan question ' || id % 1000 || '?', 'a', 'b', 'c', 'd', 'a', 1,
+                   CASE WHEN id % 10 = 0 THEN NULL ELSE received_at + interval '30 seconds' END,
+                   md5('planquestion' || id % 1000)
+            FROM request_statistic WHERE id > :first_id AND operation = 'get_test'
+        """), {'first_id': first_id})
+        await session.execute(text("""
+            INSERT INTO feedback (value, user_comment, request_id, viewed)
+            SELECT CASE WHEN id % 2 = 0 THEN 'like' ELSE 'dislike' END, NULL, id, id % 1000 <> 0
+            FROM request_statistic WHERE id > :first_id AND id % 50 = 0
+        """), {'first_id': first_id})
+        await session.execute(text("""
+            INSERT INTO contest (user_id, doc_name, total_tests, cheat_tests, answer_question_feedbacks,
+                                 test_feedbacks, points)
+            SELECT user_id, doc_name, count(*), 0, 0, 0, least(count(*), 999)
+            FROM request_statistic
+            WHERE id > :first_id AND operation = 'get_test' AND doc_name IN (:itm, :datapk)
+            GROUP BY user_id, doc_name
+            ON CONFLICT (user_id, doc_name) DO NOTHING
+        """), {'first_id': first_id, 'itm': DOCS[0], 'datapk': DOCS[1]})
+        for table in LARGE_TABLES:
+            await session.execute(text(f'ANALYZE {table}'))
+        await session.commit()
+    print(f'seeded {rows} statistic rows for {users} users')
+
+
+async def sample_ids(session) -> tuple[int, int]:
+    user_id = (await session.execute(
+        select(user.c.id).where(user.c.email.like(SEED_EMAIL)).order_by(user.c.id).limit(1)
+    )).scalar()
+    test_request_id = (await session.execute(
+        select(test_system.c.request_id).where(test_system.c.answered_at.is_(None))
+        .order_by(test_system.c.request_id.desc()).limit(1)
+    )).scalar()
+    return user_id, test_request_id
+
+
+def queries(user_id: int, test_request_id: int) -> dict:
+    now = datetime.now()
+    return {
+        'count_points: get_answer requests in test window': select(request_statistic.c.id).where(
+            and_(
+                request_statistic.c.user_id == user_id,
+                request_statistic.c.operation == 'get_answer',
+                request_statistic.c.doc_name == DOCS[0],
+                request_statistic.c.received_at < now,
+                request_statistic.c.received_at > now - timedelta(minutes=10)
+            )
+        ),
+        'count_points: question asked in test window': select(exists().where(
+            and_(
+                answer_question_system.c.question_fingerprint == question_fingerprint('Plan question 1?'),
+                request_statistic.c.id == answer_question_system.c.request_id,
+                request_statistic.c.user_id == user_id,
+                request_statistic.c.operation == 'get_answer',
+                request_statistic.c.doc_name == DOCS[0],
+                request_statistic.c.received_at < now,
+                request_statistic.c.received_at > now - timedelta(minutes=10)
+            )
+        )),
+        'check_test: unanswered test': select(test_system.c.right_answer).where(
+            and_(test_system.c.request_id == test_request_id, test_system.c.answered_at.is_(None))
+        ),
+        'admin notice: tokens by doc today': select(
+            request_statistic.c.doc_name, func.sum(request_statistic.c.tokens)
+        ).where(
+            and_(
+                request_statistic.c.user_id == user_id,
+                request_statistic.c.received_at >= datetime.combine(now.date(), datetime.min.time())
+            )
+        ).group_by(request_statistic.c.doc_name),
+        'get_feedback: not viewed page': select(feedback, request_statistic.c.doc_name).select_from(
+            feedback.outerjoin(request_statistic, request_statistic.c.id == feedback.c.request_id)
+        ).where(
+            and_(feedback.c.viewed == False, feedback.c.id > 0)
+        ).order_by(feedback.c.id).limit(101),
+        'get_feedback: doc page': select(feedback, request_statistic.c.doc_name).select_from(
+            feedback.outerjoin(request_statistic, request_statistic.c.id == feedback.c.request_id)
+        ).where(
+            and_(request_statistic.c.doc_name == 'plan_rare_doc', feedback.c.id > 0)
+        ).order_by(feedback.c.id).limit(101),
+        'requests of a doc': select(request_statistic.c.id).where(
+            request_statistic.c.doc_name == 'plan_rare_doc'
+        ).limit(100),
+        'fill_contest: contest row': select(contest).where(
+            and_(contest.c.user_id == user_id, contest.c.doc_name == DOCS[0])
+        ),
+    }
+
+
+def walk(plan: dict):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from walk(child)
+
+
+async def run(runs: int, verbose: bool) -> bool:
+    async with async_session_maker() as session:
+        user_id, test_request_id = await sample_ids(session)
+        if user_id is None:
+            sys.exit('no seeded rows, run with --seed first')
+
+        ok = True
+        print(f"{'query':<52}{'median ms':>10}  plan")
+        for name, query in queries(user_id, test_request_id).items():
+            timings = []
+            for _ in range(runs):
+                raw = (await session.execute(Explain(query))).scalar()
+                result = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+                timings.append(result['Execution Time'])
+
+            nodes = list(walk(result['Plan']))
+            seq_scans = sorted({node['Relation Name'] for node in nodes
+                                if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in LARGE_TABLES})
+            scans = ', '.join(sorted({f"{node['Node Type']} {node.get('Index Name') or node.get('Relation Name')}"
+                                      for node in nodes if 'Relation Name' in node}))
+            status = f'REGRESSION: seq scan on {", ".join(seq_scans)}' if seq_scans else scans
+            ok = ok and not seq_scans
+            print(f'{name:<52}{statistics.median(timings):>10.2f}  {status}')
+            if verbose:
+                print(json.dumps(result['Plan'], indent=2))
+        await session.rollback()
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seed', action='store_true')
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.seed:
+        await seed(args.rows, args.users)
+    if not await run(args.runs, args.verbose):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,111 @@
+"""
+Rows per second of the request_statistic write path.
+
+Compares the old flow (insert, commit, SELECT ... ORDER BY id DESC LIMIT 1, child insert, commit)
+with one transaction per row and with the multi-row batches written by StatisticsWriter.
+Writes real rows, so point DB_* at a scratch database:
+
+    python -m benchmarks.statistics_write --user-id 1 --rows 2000 --concurrency 10
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import insert, select
+
+from database.database import async_session_maker
+from src.llm_service.models import request_statistic, answer_question_system
+from src.llm_service.statistics import build_statistic_row, write_statistic_rows, statistics_writer
+
+
+RESPONSE = {'question': 'benchmark question', 'answer': 'benchmark answer'}
+
+
+async def old_write(user_id: int) -> None:
+    async with async_session_maker() as session:
+        await session.execute(insert(request_statistic).values(
+            user_id=user_id,
+            received_at=datetime.now(),
+            operation='get_answer',
+            doc_name='benchmark',
+            tokens=1,
+            embedding_tokens=0,
+            total_time=0.1,
+            gigachat_time=0.1,
+            from_cache=False
+        ))
+        await session.commit()
+        last_row = await session.execute(select(request_statistic).order_by(request_statistic.c.id.desc()).limit(1))
+        await session.execute(insert(answer_question_system).values(
+            request_id=last_row.scalar(), metrics={}, **RESPONSE
+        ))
+        await session.commit()
+
+
+async def build_rows(user_id: int, count: int) -> list[dict]:
+    return [
+        build_statistic_row(
+            request_id=await statistics_writer.reserve_id(),
+            current_user=SimpleNamespace(id=user_id),
+            operation='get_answer',
+            prompt_path=None,
+            filename='benchmark',
+            tokens=1,
+            embedding_tokens=0,
+            total_time=0.1,
+            metrics={},
+            gigachat_time=0.1,
+            from_cache=False,
+            response=RESPONSE
+        )
+        for _ in range(count)
+    ]
+
+
+async def single_write(user_id: int) -> None:
+    rows = await build_rows(user_id, 1)
+    async with async_session_maker() as session:
+        await write_statistic_rows(session, rows)
+
+
+async def batch_write(user_id: int, batch_size: int) -> None:
+    rows = await build_rows(user_id, batch_size)
+    async with async_session_maker() as session:
+        await write_statistic_rows(session, rows)
+
+
+async def run(write, calls: int, rows_per_call: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await write()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return calls * rows_per_call / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--user-id', type=int, required=True)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    batches = max(args.rows // args.batch_size, 1)
+    cases = (
+        ('before', lambda: old_write(args.user_id), args.rows, 1),
+        ('single', lambda: single_write(args.user_id), args.rows, 1),
+        ('batched', lambda: batch_write(args.user_id, args.batch_size), batches, args.batch_size),
+    )
+    for name, write, calls, rows_per_call in cases:
+        rate = await run(write, calls, rows_per_call, args.concurrency)
+        print(f'{name:>7}: {rate:8.1f} rows/s')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
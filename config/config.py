@@ -5,12 +5,37 @@ import os
 
 load_dotenv()
 
+
+def env_flag(name: str, default: str = 'False') -> bool:
+    return os.getenv(name, default).lower() in ('true', '1', 't', 'y', 'yes')
+
+
 DB_HOST = os.environ.get("DB_HOST")
 DB_PORT = os.environ.get("DB_PORT")
 DB_NAME = os.environ.get("DB_NAME")
 DB_USER = os.environ.get("DB_USER")
 DB_PASS = os.environ.get("DB_PASS")
 
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = env_flag('DB_POOL_PRE_PING', 'True')
+# asyncpg prepared statements cached per connection
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 500))
+# server-side statement_timeout in milliseconds for app sessions, 0 disables it; long running SQL on them
+# (benchmarks.query_plans --seed) runs SET LOCAL statement_timeout = 0 in its transaction
+DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 30000))
+
+# optional streaming replica for analytics and leaderboards, unset DB_REPLICA_HOST to read from the primary
+DB_REPLICA_HOST = os.environ.get("DB_REPLICA_HOST")
+DB_REPLICA_PORT = os.environ.get("DB_REPLICA_PORT", DB_PORT)
+# replay lag in seconds above which reads go to the primary
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 10))
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get("DB_REPLICA_CHECK_INTERVAL", 5))
+# connect timeout of replica connections and time limit of the lag check, in seconds
+DB_REPLICA_CHECK_TIMEOUT = float(os.environ.get("DB_REPLICA_CHECK_TIMEOUT", 2))
+
 SECRET_MANAGER = os.environ.get("SECRET_MANAGER")
 SECRET_JWT = os.environ.get("SECRET_JWT")
 
@@ -36,8 +61,97 @@ admin_dict: dict[str: Any] = {
     'is_verified': True
 }
 SEND_ADMIN_NOTICES = os.getenv('SEND_ADMIN_NOTICES', 'False').lower() in ('true', '1', 't', 'y', 'yes')
+DAILY_TOKEN_LIMIT = int(os.environ.get("DAILY_TOKEN_LIMIT", 63000))
 
 SERVER_DOMEN = os.environ.get("SERVER_DOMEN")
 
 REDIS_PORT = int(os.environ.get("REDIS_PORT"))
 
+LLM_API_URL = os.environ.get("LLM_API_URL", "http://gigachat_api:8080")
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", 100))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", 20))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", 30))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", 5))
+LLM_HTTP2 = env_flag('LLM_HTTP2')
+
+# read timeouts in seconds for every gigachat_api endpoint
+LLM_TIMEOUTS: dict[str, float] = {
+    'process_questions': 150,
+    'process_questions_stream': 150,
+    'process_data': 150,
+    'process_doc': 150,
+    'process_add_data': 60,
+    'process_delete_doc': 10,
+    'process_change_doc_name': 10,
+    'process_get_actual_doc_list': 10,
+}
+LLM_DEFAULT_TIMEOUT = float(os.environ.get("LLM_DEFAULT_TIMEOUT", 150))
+
+# adaptive (AIMD) concurrency limits, tracked per class of gigachat_api endpoints
+LLM_LIMIT_CLASSES: dict[str, str] = {
+    'process_questions': 'qa',
+    'process_questions_stream': 'qa',
+    'process_data': 'test',
+    'process_doc': 'ingest',
+    'process_add_data': 'ingest',
+}
+# class: (initial limit, max limit, latency target in seconds)
+LLM_LIMITS: dict[str, tuple[int, int, float]] = {
+    'qa': (16, 64, 20),
+    'test': (8, 32, 40),
+    'ingest': (2, 4, 150),
+    'other': (8, 16, 5),
+}
+LLM_LIMIT_MIN = int(os.environ.get("LLM_LIMIT_MIN", 1))
+LLM_LIMIT_BACKOFF = float(os.environ.get("LLM_LIMIT_BACKOFF", 0.8))
+LLM_LIMIT_QUEUE_SIZE = int(os.environ.get("LLM_LIMIT_QUEUE_SIZE", 100))
+LLM_LIMIT_QUEUE_TIMEOUT = float(os.environ.get("LLM_LIMIT_QUEUE_TIMEOUT", 10))
+
+# circuit breaker, a call fails when it errors or takes longer than LLM_BREAKER_SLOW_FACTOR * latency target
+LLM_BREAKER_WINDOW = int(os.environ.get("LLM_BREAKER_WINDOW", 20))
+LLM_BREAKER_MIN_CALLS = int(os.environ.get("LLM_BREAKER_MIN_CALLS", 10))
+LLM_BREAKER_FAILURE_RATE = float(os.environ.get("LLM_BREAKER_FAILURE_RATE", 0.5))
+LLM_BREAKER_SLOW_FACTOR = float(os.environ.get("LLM_BREAKER_SLOW_FACTOR", 3))
+LLM_BREAKER_OPEN_SECONDS = float(os.environ.get("LLM_BREAKER_OPEN_SECONDS", 30))
+
+REDIS_HOST = os.environ.get("REDIS_HOST", "redis")
+
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 1024))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", 3600))
+ANSWER_CACHE_REDIS = env_flag('ANSWER_CACHE_REDIS')
+ANSWER_CACHE_REDIS_DB = int(os.environ.get("ANSWER_CACHE_REDIS_DB", 2))
+
+# pre-generated /get_test questions kept per doc, 0 disables the pool
+TEST_POOL_WATERMARK = int(os.environ.get("TEST_POOL_WATERMARK", 5))
+TEST_POOL_CONCURRENCY = int(os.environ.get("TEST_POOL_CONCURRENCY", 2))
+TEST_POOL_RETRY_DELAY = float(os.environ.get("TEST_POOL_RETRY_DELAY", 10))
+TEST_POOL_MAX_FAILURES = int(os.environ.get("TEST_POOL_MAX_FAILURES", 5))
+
+# write-behind pipeline for request_statistic rows
+STATISTICS_QUEUE_SIZE = int(os.environ.get("STATISTICS_QUEUE_SIZE", 10000))
+STATISTICS_BATCH_SIZE = int(os.environ.get("STATISTICS_BATCH_SIZE", 200))
+STATISTICS_PUT_TIMEOUT = float(os.environ.get("STATISTICS_PUT_TIMEOUT", 1))
+STATISTICS_ID_BLOCK = int(os.environ.get("STATISTICS_ID_BLOCK", 50))
+STATISTICS_WAIT_TIMEOUT = float(os.environ.get("STATISTICS_WAIT_TIMEOUT", 5))
+# retries of a batch failed by a connection or server error, a row level error splits the batch instead
+STATISTICS_WRITE_RETRIES = int(os.environ.get("STATISTICS_WRITE_RETRIES", 2))
+STATISTICS_RETRY_DELAY = float(os.environ.get("STATISTICS_RETRY_DELAY", 1))
+
+# authenticated users cached per JWT, 0 disables the cache
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 30))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+
+# threads running bcrypt hashing and verification off the event loop
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 4))
+
+# seconds before an in-memory contest leaderboard is rebuilt from the db, 0 keeps it forever
+LEADERBOARD_REFRESH_INTERVAL = float(os.environ.get("LEADERBOARD_REFRESH_INTERVAL", 300))
+# serialized (offset, limit) pages kept per board until its next award
+LEADERBOARD_PAGE_CACHE_SIZE = int(os.environ.get("LEADERBOARD_PAGE_CACHE_SIZE", 32))
+
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", 200 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+
+# background document ingestion
+INGEST_CONCURRENCY = int(os.environ.get("INGEST_CONCURRENCY", 1))
+INGEST_SPOOL_MAX_MEMORY = int(os.environ.get("INGEST_SPOOL_MAX_MEMORY", 32 * 1024 * 1024))
@@ -1,19 +1,165 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql import text
 
-from config.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from config.config import (DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                           DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_STATEMENT_CACHE_SIZE, DB_STATEMENT_TIMEOUT,
+                           DB_REPLICA_HOST, DB_REPLICA_PORT, DB_REPLICA_MAX_LAG, DB_REPLICA_CHECK_INTERVAL,
+                           DB_REPLICA_CHECK_TIMEOUT)
+from config.logs import doc_info
+from src.monitoring.metrics import DB_POOL_WAIT
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+REPLICA_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}"
 Base = declarative_base()
 
 
-engine = create_async_engine(DATABASE_URL)
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long every checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            DB_POOL_WAIT.observe(wait)
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size(),
+            'checked_out': self.checkedout(),
+            'idle': self.checkedin(),
+            'overflow': max(self.overflow(), 0),
+            'max_overflow': self._max_overflow,
+            'checkouts': self.checkouts,
+            'wait_avg_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+            'wait_max_ms': round(self.wait_max * 1000, 3),
+        }
+
+
+def create_engine(url: str = DATABASE_URL, connect_args: dict | None = None, **kwargs):
+    """connect_args are added to the defaults (statement cache size, statement_timeout)."""
+    connect_args = {'prepared_statement_cache_size': DB_STATEMENT_CACHE_SIZE, **(connect_args or {})}
+    if DB_STATEMENT_TIMEOUT:
+        connect_args.setdefault('server_settings', {'statement_timeout': str(DB_STATEMENT_TIMEOUT)})
+
+    options = dict(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    options.update(kwargs)
+    return create_async_engine(url, **options)
+
+
+engine = create_engine()
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         yield session
+
+
+class ReplicaState:
+    """
+    Whether the replica is reachable and within max_lag seconds of the primary.
+
+    Checked at most once per check_interval, within check_timeout. Lag is the age of the last
+    replayed transaction, or 0 when everything received has been replayed (an idle primary).
+    It is NULL, and the replica unusable, while the WAL receiver is not streaming: a disconnected
+    replica has replayed all it received but may be arbitrarily stale. Reading the receiver
+    status needs the pg_read_all_stats role.
+    """
+
+    LAG_QUERY = text(
+        "SELECT CASE "
+        "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL "
+        "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    )
+
+    def __init__(self, session_maker, max_lag: float, check_interval: float, check_timeout: float):
+        self.session_maker = session_maker
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.lag: float | None = None
+        self.usable = False
+        self._checked_at = float('-inf')
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> bool:
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return self.usable
+        async with self._lock:
+            if time.monotonic() - self._checked_at < self.check_interval:
+                return self.usable
+            try:
+                lag = await asyncio.wait_for(self._lag(), self.check_timeout)
+                if lag is None:
+                    doc_info.warning('replica is not streaming from the primary, reading from the primary')
+                self.lag = None if lag is None else float(lag)
+                usable = self.lag is not None and self.lag <= self.max_lag
+            except Exception as e:
+                doc_info.warning(f'replica is unavailable, reading from the primary: {e!r}')
+                self.lag, usable = None, False
+            if usable != self.usable:
+                doc_info.info(f'replica reads {"enabled" if usable else "disabled"}, lag {self.lag}')
+            self.usable = usable
+            self._checked_at = time.monotonic()
+        return self.usable
+
+    async def _lag(self):
+        async with self.session_maker() as session:
+            return (await session.execute(self.LAG_QUERY)).scalar()
+
+
+if DB_REPLICA_HOST:
+    replica_engine = create_engine(REPLICA_DATABASE_URL, connect_args={'timeout': DB_REPLICA_CHECK_TIMEOUT})
+    replica_state = ReplicaState(
+        sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False),
+        max_lag=DB_REPLICA_MAX_LAG,
+        check_interval=DB_REPLICA_CHECK_INTERVAL,
+        check_timeout=DB_REPLICA_CHECK_TIMEOUT
+    )
+else:
+    replica_engine = None
+    replica_state = None
+
+
+@asynccontextmanager
+async def read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Session on the replica when it is configured and fresh enough, on the primary otherwise."""
+    if replica_state is not None and await replica_state.check():
+        session_maker = replica_state.session_maker
+    else:
+        session_maker = async_session_maker
+    async with session_maker() as session:
+        yield session
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    async with read_session() as session:
+        yield session
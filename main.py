@@ -1,5 +1,6 @@
 import uvicorn
 import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
@@ -11,13 +12,37 @@ from src.docs.router import router as upload_docs_router
 from src.llm_service.router import router as llm_service_router
 from src.admin_panel.router import router as admin_panel_router
 from src.llm_service.contest import router as contest_router
+from src.monitoring.router import router as monitoring_router
+from src.monitoring.metrics import MetricsMiddleware, instrument_engine
+from database.database import engine
 from config.config import CORS_ORIGINS
+from src.services.llm_client import llm_client
+from src.llm_service.cache import answer_cache
+from src.llm_service.test_pool import test_pool
+from src.llm_service.statistics import statistics_writer
+from src.docs.jobs import ingest_jobs
+from src.auth.password import password_helper
 from check_doc_table import check_doc_table
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await llm_client.start()
+    statistics_writer.start()
+    await ingest_jobs.fail_interrupted()
+    yield
+    await ingest_jobs.close()
+    await test_pool.close()
+    await statistics_writer.close()
+    await llm_client.close()
+    await answer_cache.close()
+    password_helper.close()
+
+
 app = FastAPI(
     title="DATAPK ITM",
-    root_path="/api"
+    root_path="/api",
+    lifespan=lifespan
 )
 
 # app.add_middleware(HTTPSRedirectMiddleware)
@@ -33,6 +58,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
 
 app.include_router(
     fastapi_users.get_auth_router(auth_backend, requires_verification=True),
@@ -77,6 +104,10 @@ app.include_router(
     prefix="/contest",
     tags=["Contest"]
 )
+app.include_router(
+    monitoring_router,
+    tags=["Monitoring"]
+)
 
 async def main():
     await check_doc_table()
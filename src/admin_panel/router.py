@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
 from fastapi_users.jwt import generate_jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.database import get_async_session
+from database.database import get_async_session, get_read_session, engine, replica_engine, replica_state
 from src.auth.models import AuthUser
 from src.admin_panel.models import admin_requests
 from src.services.celery_service import send_email
 from sqlalchemy import select, update, func, and_
 from src.auth.auth_config import current_superuser
-from src.llm_service.models import request_statistic, feedback
+from src.llm_service.models import request_statistic, feedback, token_usage_rollup
+from src.llm_service.test_pool import test_pool
 from config.config import SECRET_MANAGER as verification_token_secret
 
 
@@ -87,44 +91,147 @@ async def accept_request(
 @router.post('/get_feedback')
 async def get_feedback(
         all_feedbacks: bool,
+        after_id: int | None = None,
+        limit: int = Query(100, ge=1, le=1000),
+        value: str | None = None,
+        doc_name: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
         user: AuthUser = Depends(current_superuser),
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_read_session)
 ):
-    if all_feedbacks:
-        query = select(feedback)
-        result = await session.execute(query)
-    else:
-        query = select(feedback).where(feedback.c.viewed == False)
-        result = await session.execute(query)
-
-    return result.mappings().all()
+    """
+    Feedback ordered by id, `limit` rows after `after_id`.
+    Pass next_after_id of the response as after_id to get the next page, it is None on the last one.
+    """
+    query = select(
+        feedback, request_statistic.c.doc_name, request_statistic.c.operation, request_statistic.c.received_at
+    ).select_from(
+        feedback.outerjoin(request_statistic, request_statistic.c.id == feedback.c.request_id)
+    ).order_by(feedback.c.id).limit(limit + 1)
+
+    if not all_feedbacks:
+        query = query.where(feedback.c.viewed == False)
+    if after_id is not None:
+        query = query.where(feedback.c.id > after_id)
+    if value is not None:
+        query = query.where(feedback.c.value == value)
+    if doc_name is not None:
+        query = query.where(request_statistic.c.doc_name == doc_name)
+    if start is not None:
+        query = query.where(request_statistic.c.received_at >= start)
+    if end is not None:
+        query = query.where(request_statistic.c.received_at < end)
+
+    rows = (await session.execute(query)).mappings().all()
+    next_after_id = rows[limit - 1]['id'] if len(rows) > limit else None
+
+    return {'feedbacks': rows[:limit], 'next_after_id': next_after_id}
 
 
 @router.post('/set_viewed')
 async def set_viewed(
-        feedback_id: int,
+        feedback_id: int | None = None,
+        from_id: int | None = None,
+        to_id: int | None = None,
+        feedback_ids: list[int] | None = Body(None),
         user: AuthUser = Depends(current_superuser),
         session: AsyncSession = Depends(get_async_session)
 ):
-    stmt = update(feedback).where(feedback.c.id == int(feedback_id)).values(viewed=True)
-    await session.execute(stmt)
+    """Marks feedback_id, the ids listed in the body or the inclusive from_id..to_id range as viewed."""
+    if feedback_id is not None:
+        condition = feedback.c.id == feedback_id
+    elif feedback_ids:
+        condition = feedback.c.id.in_(feedback_ids)
+    elif from_id is not None and to_id is not None:
+        condition = feedback.c.id.between(from_id, to_id)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pass feedback_id, a list of feedback ids or both from_id and to_id"
+        )
+
+    stmt = update(feedback).where(and_(condition, feedback.c.viewed == False)).values(viewed=True)
+    result = await session.execute(stmt)
     await session.commit()
 
-    return {'status': f'feedback #{feedback_id} was viewed'}
+    if feedback_id is not None:
+        return {'status': f'feedback #{feedback_id} was viewed'}
+    return {'status': f'{result.rowcount} feedbacks were viewed'}
 
 @router.post('/get_tokens')
 async def get_tokens(
         operation: str,
         user: AuthUser = Depends(current_superuser),
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_read_session)
 ):
+    query = select(func.sum(token_usage_rollup.c.tokens)).where(token_usage_rollup.c.granularity == 'day')
     if operation in ('get_test', 'get_answer'):
-        query = select(func.sum(request_statistic.c.tokens)).where(request_statistic.c.operation == operation)
-        result = await session.execute(query)
-    elif operation == 'both':
-        query = select(func.sum(request_statistic.c.tokens))
-        result = await session.execute(query)
-    else:
+        query = query.where(token_usage_rollup.c.operation == operation)
+    elif operation != 'both':
         raise ValueError("Unexpected operation")
-    
-    return result.scalar()
\ No newline at end of file
+
+    tokens = (await session.execute(query)).scalar()
+    return int(tokens) if tokens is not None else None
+
+
+@router.get('/token_usage')
+async def get_token_usage(
+        start: datetime,
+        end: datetime,
+        granularity: Literal['hour', 'day'] = 'day',
+        group_by: list[Literal['bucket', 'operation', 'doc_name', 'user_id']] = Query(['bucket']),
+        operation: str | None = None,
+        doc_name: str | None = None,
+        user_id: int | None = None,
+        user: AuthUser = Depends(current_superuser),
+        session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Token usage sums from the hourly or daily rollups, buckets in [start, end).
+    doc_name '' and user_id 0 stand for requests without a doc or a user.
+    """
+    group_columns = [token_usage_rollup.c[column] for column in dict.fromkeys(group_by)]
+    query = select(
+        *group_columns,
+        func.sum(token_usage_rollup.c.requests).label('requests'),
+        func.sum(token_usage_rollup.c.tokens).label('tokens'),
+        func.sum(token_usage_rollup.c.embedding_tokens).label('embedding_tokens'),
+        func.sum(token_usage_rollup.c.total_time).label('total_time'),
+        func.sum(token_usage_rollup.c.gigachat_time).label('gigachat_time'),
+        func.sum(token_usage_rollup.c.cache_hits).label('cache_hits')
+    ).where(
+        and_(
+            token_usage_rollup.c.granularity == granularity,
+            token_usage_rollup.c.bucket >= start,
+            token_usage_rollup.c.bucket < end
+        )
+    ).group_by(*group_columns).order_by(*group_columns)
+
+    if operation is not None:
+        query = query.where(token_usage_rollup.c.operation == operation)
+    if doc_name is not None:
+        query = query.where(token_usage_rollup.c.doc_name == doc_name)
+    if user_id is not None:
+        query = query.where(token_usage_rollup.c.user_id == user_id)
+
+    return (await session.execute(query)).mappings().all()
+
+
+@router.get('/test_pool')
+async def get_test_pool_depth(
+        user: AuthUser = Depends(current_superuser)
+):
+    return test_pool.depth()
+
+
+@router.get('/db_pool')
+async def get_db_pool_stats(
+        user: AuthUser = Depends(current_superuser)
+):
+    if replica_engine is None:
+        return {'primary': engine.pool.stats(), 'replica': None}
+    return {
+        'primary': engine.pool.stats(),
+        'replica': {**replica_engine.pool.stats(), 'lag': replica_state.lag, 'usable': replica_state.usable}
+    }
@@ -1,16 +1,16 @@
 from fastapi_users import FastAPIUsers
 from fastapi_users.authentication import CookieTransport, AuthenticationBackend
-from fastapi_users.authentication import JWTStrategy
 
 from src.auth.manager import get_user_manager
+from src.auth.cache import CachedJWTStrategy
 from src.auth.models import AuthUser
 from config.config import SECRET_JWT
 
 cookie_transport = CookieTransport(cookie_name="bonds", cookie_max_age=3600, cookie_samesite="none", cookie_secure=True)
 
 
-def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET_JWT, lifetime_seconds=3600)
+def get_jwt_strategy() -> CachedJWTStrategy:
+    return CachedJWTStrategy(secret=SECRET_JWT, lifetime_seconds=3600)
 
 
 auth_backend = AuthenticationBackend(
@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+import jwt
+from fastapi_users import BaseUserManager, exceptions
+from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.auth.models import AuthUser
+from config.config import USER_CACHE_TTL, USER_CACHE_SIZE
+
+
+class UserCache:
+    """
+    Short-lived cache of authenticated users keyed by JWT, indexed by user id for invalidation.
+
+    Column values are stored rather than instances, every hit builds a new detached AuthUser.
+    Invalidation is per process, other workers see a change after at most `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()
+        self._tokens: dict[int, set[str]] = defaultdict(set)
+        self._generations: dict[int, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, user_id: int) -> int:
+        return self._generations[user_id]
+
+    def get(self, token: str) -> AuthUser | None:
+        entry = self._entries.get(token)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(token)
+            self.misses += 1
+            return None
+        self.hits += 1
+        cached_user = AuthUser(**entry[2])
+        make_transient_to_detached(cached_user)
+        return cached_user
+
+    def set(self, token: str, user: AuthUser, generation: int, token_expires_at: float | None = None) -> None:
+        # a user updated while being loaded is not cached
+        if self.ttl <= 0 or generation != self._generations[user.id]:
+            return
+        ttl = self.ttl
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        values = {column.key: getattr(user, column.key) for column in AuthUser.__table__.columns}
+        self._entries[token] = (time.monotonic() + ttl, user.id, values)
+        self._tokens[user.id].add(token)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, token: str) -> None:
+        _, user_id, _ = self._entries.pop(token)
+        tokens = self._tokens.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[user_id]
+
+    def invalidate(self, user_id: int) -> None:
+        self._generations[user_id] += 1
+        for token in self._tokens.pop(user_id, ()):
+            self._entries.pop(token, None)
+
+
+user_cache = UserCache(ttl=USER_CACHE_TTL, maxsize=USER_CACHE_SIZE)
+
+
+class CachedJWTStrategy(JWTStrategy):
+    async def read_token(self, token: Optional[str], user_manager: BaseUserManager) -> Optional[AuthUser]:
+        if token is None:
+            return None
+
+        cached_user = user_cache.get(token)
+        if cached_user is not None:
+            return cached_user
+
+        try:
+            data = decode_jwt(token, self.decode_key, self.token_audience, algorithms=[self.algorithm])
+            user_id = data.get("sub")
+            if user_id is None:
+                return None
+        except jwt.PyJWTError:
+            return None
+
+        try:
+            parsed_id = user_manager.parse_id(user_id)
+            generation = user_cache.generation(parsed_id)
+            auth_user = await user_manager.get(parsed_id)
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+        user_cache.set(token, auth_user, generation, data.get("exp"))
+        return auth_user
@@ -2,11 +2,14 @@ import jwt
 from typing import Optional, Dict, Any
 
 from fastapi import Depends, Request, Response, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import BaseUserManager, exceptions, IntegerIDMixin, models, schemas, InvalidPasswordException
 from fastapi_users.jwt import generate_jwt, decode_jwt
 
 from src.auth.models import AuthUser
 from src.auth.utils import get_user_db
+from src.auth.cache import user_cache
+from src.auth.password import password_helper
 from src.services.celery_service import send_email
 from database.database import async_session_maker
 from src.admin_panel.utils import add_admin_request
@@ -35,7 +38,7 @@ class UserManager(IntegerIDMixin, BaseUserManager[AuthUser, int]):
         print(f"User {user.id} has forgot his password")
         token_data = {
             "sub": str(user.id),
-            "password_fgpt": self.password_helper.hash(user.hashed_password),
+            "password_fgpt": await self.password_helper.hash_async(user.hashed_password),
             "aud": self.reset_password_token_audience,
         }
         token = generate_jwt(
@@ -71,8 +74,10 @@ class UserManager(IntegerIDMixin, BaseUserManager[AuthUser, int]):
                 except KeyError:
                     raise InvalidPasswordException(reason='Confirmation password is not filled')
                 try:
-                    if not user_update.get('reset_password') and not self.password_helper.verify_and_update(
-                            user_update['old_password'], user.hashed_password)[0]:
+                    if not user_update.get('reset_password') and not (
+                            await self.password_helper.verify_and_update_async(
+                                user_update['old_password'], user.hashed_password
+                            ))[0]:
                         raise InvalidPasswordException(reason="Invalid password")
                 except KeyError:
                     raise InvalidPasswordException(reason='Old password is not filled')
@@ -113,12 +118,12 @@ class UserManager(IntegerIDMixin, BaseUserManager[AuthUser, int]):
             if user_dict["password"] == admin_dict["password"]:
                 user_dict = admin_dict.copy()
                 password = user_dict.pop("password")
-                user_dict["hashed_password"] = self.password_helper.hash(password)
+                user_dict["hashed_password"] = await self.password_helper.hash_async(password)
             else:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
         else:
             password = user_dict.pop("password")
-            user_dict["hashed_password"] = self.password_helper.hash(password)
+            user_dict["hashed_password"] = await self.password_helper.hash_async(password)
 
             user_dict.pop("confirmation_password")
             user_dict["is_active"] = True
@@ -183,6 +188,32 @@ class UserManager(IntegerIDMixin, BaseUserManager[AuthUser, int]):
 
         return verified_user
 
+    async def authenticate(self, credentials: OAuth2PasswordRequestForm) -> Optional[models.UP]:
+        """
+        Authenticate and return a user following an email and a password.
+
+        Will automatically upgrade password hash if necessary.
+
+        :param credentials: The user credentials.
+        """
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Run the hasher to mitigate timing attack
+            await self.password_helper.hash_async(credentials.password)
+            return None
+
+        verified, updated_password_hash = await self.password_helper.verify_and_update_async(
+            credentials.password, user.hashed_password
+        )
+        if not verified:
+            return None
+        # Update password hash to a more robust one if needed
+        if updated_password_hash is not None:
+            await self.user_db.update(user, {"hashed_password": updated_password_hash})
+
+        return user
+
     async def on_after_login(
             self,
             user: models.UP,
@@ -240,7 +271,7 @@ class UserManager(IntegerIDMixin, BaseUserManager[AuthUser, int]):
 
         user = await self.get(parsed_id)
 
-        valid_password_fingerprint, _ = self.password_helper.verify_and_update(
+        valid_password_fingerprint, _ = await self.password_helper.verify_and_update_async(
             user.hashed_password, password_fingerprint
         )
         if not valid_password_fingerprint:
@@ -296,13 +327,19 @@ class UserManager(IntegerIDMixin, BaseUserManager[AuthUser, int]):
                     # validated_update_dict["is_verified"] = False
             elif field in ("password", "reset_password") and value is not None:
                 await self.validate_password(value, user, update_dict)
-                validated_update_dict["hashed_password"] = self.password_helper.hash(
+                validated_update_dict["hashed_password"] = await self.password_helper.hash_async(
                     value
                 )
             elif field not in ('confirmation_password', 'old_password'):
                 validated_update_dict[field] = value
-        return await self.user_db.update(user, validated_update_dict)
+        user_cache.invalidate(user.id)
+        updated_user = await self.user_db.update(user, validated_update_dict)
+        user_cache.invalidate(user.id)
+        return updated_user
+
+    async def on_after_delete(self, user: AuthUser, request: Optional[Request] = None) -> None:
+        user_cache.invalidate(user.id)
 
 
 async def get_user_manager(user_db=Depends(get_user_db)):
-    yield UserManager(user_db)
\ No newline at end of file
+    yield UserManager(user_db, password_helper)
\ No newline at end of file
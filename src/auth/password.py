@@ -0,0 +1,29 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from fastapi_users.password import PasswordHelper
+
+from config.config import PASSWORD_HASH_WORKERS
+
+
+class AsyncPasswordHelper(PasswordHelper):
+    """PasswordHelper with awaitable variants that run bcrypt in a bounded thread pool."""
+
+    def __init__(self, max_workers: int):
+        super().__init__()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password')
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.hash, password)
+
+    async def verify_and_update_async(self, plain_password: str, hashed_password: str) -> Tuple[bool, str]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.verify_and_update, plain_password, hashed_password
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_helper = AsyncPasswordHelper(max_workers=PASSWORD_HASH_WORKERS)
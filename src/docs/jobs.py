@@ -0,0 +1,170 @@
+import asyncio
+import tempfile
+from datetime import datetime
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+from config.config import INGEST_CONCURRENCY, INGEST_SPOOL_MAX_MEMORY, UPLOAD_CHUNK_SIZE
+from config.logs import doc_info
+from database.database import async_session_maker
+from src.docs.models import doc, doc_job
+from src.docs.utils import send_file_to_llm, request_add_data
+from src.llm_service.cache import answer_cache
+from src.llm_service.test_pool import test_pool
+
+
+ACTIVE_STATUSES = ('queued', 'uploading', 'embedding')
+
+
+class IngestJobs:
+    """
+    Background document ingestion.
+
+    The job row is created as queued before the request body is read, so the partial unique index
+    on active jobs rejects a second upload or add_data of the same doc name up front. The body is
+    then spooled (in memory up to INGEST_SPOOL_MAX_MEMORY) and a task sends it to gigachat_api,
+    with at most `concurrency` jobs talking to the backend at once.
+    """
+
+    def __init__(self, concurrency: int, spool_max_memory: int):
+        self.spool_max_memory = spool_max_memory
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    async def _set(job_id: int, **values) -> None:
+        async with async_session_maker() as session:
+            stmt = update(doc_job).where(doc_job.c.id == job_id).values(updated_at=datetime.now(), **values)
+            await session.execute(stmt)
+            await session.commit()
+
+    async def create(
+        self,
+        kind: str,
+        doc_name: str,
+        description: str | None,
+        extension: str,
+        user_id: int,
+        chunks: AsyncIterator[bytes]
+    ) -> int:
+        async with async_session_maker() as session:
+            stmt = insert(doc_job).values(
+                kind=kind,
+                doc_name=doc_name,
+                description=description,
+                type=extension,
+                status='queued',
+                progress=0,
+                user_id=user_id,
+                created_at=datetime.now(),
+                updated_at=datetime.now()
+            ).returning(doc_job.c.id)
+            try:
+                job_id = (await session.execute(stmt)).scalar_one()
+                await session.commit()
+            except IntegrityError:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                    detail="Document with this name is already being processed")
+
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory)
+        size = 0
+        try:
+            async for chunk in chunks:
+                # past spool_max_memory the spool is on disk, keep its writes off the event loop
+                if size + len(chunk) > self.spool_max_memory:
+                    await asyncio.to_thread(spool.write, chunk)
+                else:
+                    spool.write(chunk)
+                size += len(chunk)
+        except BaseException as e:
+            spool.close()
+            await self._set(job_id, status='failed', error=getattr(e, 'detail', None) or repr(e))
+            raise
+
+        task = asyncio.create_task(self._run(job_id, kind, doc_name, description, extension, user_id, spool, size))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _read_spool(self, job_id: int, spool, size: int) -> AsyncIterator[bytes]:
+        sent = 0
+        reported = 0.0
+        await asyncio.to_thread(spool.seek, 0)
+        while chunk := await asyncio.to_thread(spool.read, UPLOAD_CHUNK_SIZE):
+            yield chunk
+            sent += len(chunk)
+            progress = round(sent / max(size, 1), 2)
+            if progress - reported >= 0.1:
+                reported = progress
+                await self._set(job_id, progress=progress)
+        await self._set(job_id, status='embedding', progress=1)
+
+    async def _run(
+        self,
+        job_id: int,
+        kind: str,
+        doc_name: str,
+        description: str | None,
+        extension: str,
+        user_id: int,
+        spool,
+        size: int
+    ) -> None:
+        new_name = f"{doc_name}.{extension}"
+        try:
+            async with self._semaphore:
+                await self._set(job_id, status='uploading')
+                doc_info.debug(f'job #{job_id}: streaming {new_name} to llm')
+
+                if kind == 'upload':
+                    response = await send_file_to_llm(new_name, self._read_spool(job_id, spool, size))
+                else:
+                    response = await request_add_data(new_name, self._read_spool(job_id, spool, size))
+
+            if kind == 'upload':
+                if response.get('result') != 'success':
+                    raise RuntimeError(f'gigachat_api response: {response}')
+                async with async_session_maker() as session:
+                    stmt = insert(doc).values(
+                        name=doc_name,
+                        type=extension,
+                        chunk_size=response['info']['chunk_size'],
+                        embedding_model=response['info']['embedding_model'],
+                        description=description,
+                        user_id=user_id)
+                    await session.execute(stmt)
+                    await session.commit()
+            else:
+                await answer_cache.invalidate(doc_name)
+                test_pool.drop(doc_name)
+
+            await self._set(job_id, status='done', progress=1)
+            doc_info.info(f'job #{job_id}: {new_name} ingested')
+        except asyncio.CancelledError:
+            await self._set(job_id, status='failed', error='interrupted')
+            raise
+        except Exception as e:
+            doc_info.error(f'job #{job_id}: {new_name} failed, {e!r}')
+            await self._set(job_id, status='failed', error=str(e))
+        finally:
+            spool.close()
+
+    async def fail_interrupted(self) -> None:
+        async with async_session_maker() as session:
+            stmt = update(doc_job).where(doc_job.c.status.in_(ACTIVE_STATUSES)).values(
+                status='failed', error='interrupted', updated_at=datetime.now()
+            )
+            await session.execute(stmt)
+            await session.commit()
+
+    async def close(self) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+ingest_jobs = IngestJobs(concurrency=INGEST_CONCURRENCY, spool_max_memory=INGEST_SPOOL_MAX_MEMORY)
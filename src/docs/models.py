@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, String, Boolean, MetaData, ForeignKey
+from sqlalchemy import Table, Column, Integer, String, Boolean, MetaData, ForeignKey, DateTime, Float, Index, text
 from src.auth.models import user
 
 
@@ -16,3 +16,22 @@ doc = Table(
     Column("user_id", Integer, ForeignKey(user.c.id)),
     Column("in_contest", Boolean, nullable=True, default=False),
 )
+
+doc_job = Table(
+    "doc_job",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("kind", String, nullable=False),
+    Column("doc_name", String, nullable=False),
+    Column("description", String, nullable=True),
+    Column("type", String, nullable=True),
+    Column("status", String, nullable=False),
+    Column("progress", Float, nullable=False, default=0),
+    Column("error", String, nullable=True),
+    Column("user_id", Integer, ForeignKey(user.c.id)),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    # one active job per doc name
+    Index("ix_doc_job_active_doc_name", "doc_name", unique=True,
+          postgresql_where=text("status IN ('queued', 'uploading', 'embedding')")),
+)
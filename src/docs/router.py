@@ -1,35 +1,33 @@
-import asyncio
-import os
-import shutil
+from typing import AsyncIterator
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
-from sqlalchemy import insert, select, delete, update, or_
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, status
+from sqlalchemy import select, delete, update, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config.logs import doc_info
 from src.auth.auth_config import current_verified_user, current_superuser
 from src.auth.models import AuthUser
 from src.docs.schemas import ChangeDoc
 from database.database import get_async_session
-from src.docs.models import doc
-from src.docs.utils import send_file_to_llm, request_delete_doc, is_valid_filename, request_change_doc_name, request_add_data
+from src.docs.models import doc, doc_job
+from src.docs.jobs import ingest_jobs
+from src.llm_service.cache import answer_cache
+from src.llm_service.test_pool import test_pool
+from src.docs.utils import (request_delete_doc, is_valid_filename, request_change_doc_name, read_upload_file,
+                            check_upload)
 
 router = APIRouter()
 
 
-@router.post(
-    '/upload-dock',
-    status_code=status.HTTP_202_ACCEPTED,
-)
-async def upload_form(
+async def upload_doc(
     dock_name: str,
     dock_description: str,
-    file: UploadFile = File(...),
-    user: AuthUser = Depends(current_superuser),
-    session: AsyncSession = Depends(get_async_session)
+    filename: str,
+    chunks: AsyncIterator[bytes],
+    user: AuthUser,
+    session: AsyncSession
 ):
     is_valid_filename(dock_name)
-    extension = file.filename.split('.')[-1]
+    extension = filename.split('.')[-1]
 
     if extension not in ('zip', 'txt'):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File has an unsupported extension")
@@ -38,35 +36,69 @@ async def upload_form(
     if (await session.execute(doc_exist)).fetchone():
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Document with this name already exists")
     
-    try:
-        new_name = f"{dock_name}.{extension}"
-        file_path = f"src/docs/temp/{new_name}"
-
-        with open(file_path, "wb") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-        
-        doc_info.debug(f'new file {new_name} saved at {file_path}')
-
-        response = await send_file_to_llm(file_path)
-        
-        if response['result'] == 'success':
-            stmt = insert(doc).values(
-                name=dock_name,
-                type=extension,
-                chunk_size=response['info']['chunk_size'],
-                embedding_model=response['info']['embedding_model'],
-                description=dock_description,
-                user_id=user.id)
-            await session.execute(stmt)
-            await session.commit()
+    job_id = await ingest_jobs.create(
+        kind='upload',
+        doc_name=dock_name,
+        description=dock_description,
+        extension=extension,
+        user_id=user.id,
+        chunks=check_upload(chunks, extension)
+    )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        await asyncio.to_thread(os.remove, file_path)
-        doc_info.debug(f'new file {new_name} has been deleted from {file_path}')
+    return {'status': 'queued', 'job_id': job_id}
+
+
+@router.post(
+    '/upload-dock',
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def upload_form(
+    dock_name: str,
+    dock_description: str,
+    file: UploadFile = File(...),
+    user: AuthUser = Depends(current_superuser),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await upload_doc(dock_name, dock_description, file.filename, read_upload_file(file), user, session)
+
+
+@router.post(
+    '/upload-dock/stream',
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def upload_stream(
+    request: Request,
+    dock_name: str,
+    dock_description: str,
+    filename: str,
+    user: AuthUser = Depends(current_superuser),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await upload_doc(dock_name, dock_description, filename, request.stream(), user, session)
+
+
+@router.get(
+    '/jobs/{job_id}',
+    status_code=status.HTTP_200_OK,
+)
+async def get_job(
+    job_id: int,
+    user: AuthUser = Depends(current_verified_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    query = select(
+        doc_job.c.id, doc_job.c.kind, doc_job.c.doc_name, doc_job.c.status, doc_job.c.progress,
+        doc_job.c.error, doc_job.c.user_id, doc_job.c.created_at, doc_job.c.updated_at
+    ).where(doc_job.c.id == job_id)
+    job = (await session.execute(query)).mappings().fetchone()
+
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job with this id was not found")
 
-    return {'status': 'added new doc'}
+    if not user.is_superuser and user.id != job['user_id']:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Forbidden")
+
+    return job
 
 
 @router.get(
@@ -108,6 +140,8 @@ async def change_doc(
     if change_data.new_name and change_data.new_name != cur_name and is_valid_filename(change_data.new_name):
         update_values['name'] = change_data.new_name
         await request_change_doc_name(cur_name, change_data.new_name)
+        await answer_cache.invalidate(cur_name)
+        test_pool.drop(cur_name)
     if change_data.description and change_data.description != cur_descriprion:
         update_values['description'] = change_data.description
 
@@ -119,45 +153,64 @@ async def change_doc(
     return
 
 
-@router.post(
-    '/add_data',
-    status_code=status.HTTP_204_NO_CONTENT,
-)
-async def add_data(
+async def add_doc_data(
     doc_name: str,
-    file: UploadFile = File(...),
-    user: AuthUser = Depends(current_verified_user),
-    session: AsyncSession = Depends(get_async_session)
+    filename: str,
+    chunks: AsyncIterator[bytes],
+    user: AuthUser,
+    session: AsyncSession
 ):
     query = select(doc.c.user_id).where(doc.c.name == doc_name)
-    cur_user_id = (await session.execute(query)).fetchone()[0]
+    current_data = (await session.execute(query)).fetchone()
 
-    if not cur_user_id:
+    if not current_data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document with this name was not found")
 
+    cur_user_id = current_data[0]
     if not user.is_superuser and user.id != cur_user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Forbidden")
     
-    extension = file.filename.split('.')[-1]
+    extension = filename.split('.')[-1]
     if extension not in ('txt'):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File has an unsupported extension")
     
-    try:
-        new_name = f"{doc_name}.{extension}"
-        file_path = f"src/docs/temp/{new_name}"
+    job_id = await ingest_jobs.create(
+        kind='add_data',
+        doc_name=doc_name,
+        description=None,
+        extension=extension,
+        user_id=user.id,
+        chunks=check_upload(chunks, extension)
+    )
 
-        with open(file_path, "wb") as file_object:
-            shutil.copyfileobj(file.file, file_object)
-        
-        doc_info.debug(f'add data file {new_name} saved at {file_path}')
+    return {'status': 'queued', 'job_id': job_id}
 
-        await request_add_data(file_path)
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        await asyncio.to_thread(os.remove, file_path)
-        doc_info.debug(f'add data file {new_name} has been deleted from {file_path}')
+@router.post(
+    '/add_data',
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def add_data(
+    doc_name: str,
+    file: UploadFile = File(...),
+    user: AuthUser = Depends(current_verified_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await add_doc_data(doc_name, file.filename, read_upload_file(file), user, session)
+
+
+@router.post(
+    '/add_data/stream',
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def add_data_stream(
+    request: Request,
+    doc_name: str,
+    filename: str,
+    user: AuthUser = Depends(current_verified_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await add_doc_data(doc_name, filename, request.stream(), user, session)
 
 
 @router.get(
@@ -214,6 +267,8 @@ async def del_my_docs(
         await session.commit()
 
         response = await request_delete_doc(doc_name)
+        await answer_cache.invalidate(doc_name)
+        test_pool.drop(doc_name)
         return(response)
     except Exception as e:
         print(e)
@@ -1,46 +1,81 @@
-import httpx
 import ipaddress
 import re
-from fastapi import HTTPException, status
+import secrets
+from typing import AsyncIterator
 
+from fastapi import HTTPException, UploadFile, status
 
-async def send_file_to_llm(file_path: str):
-    async with httpx.AsyncClient() as client:
-        url = "http://gigachat_api:8080/process_doc"
-        with open(file_path, "rb") as file:
-            files = {"file": (file.name.split('/')[-1], file, "application/octet-stream")}
-            response = await client.post(url, files=files, timeout=150)
-            return response.json()
+from config.config import MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE
+from src.services.llm_client import llm_client
+
+
+ZIP_SIGNATURES = (b'PK\x03\x04', b'PK\x05\x06')
+
+
+async def read_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def check_upload(chunks: AsyncIterator[bytes], extension: str) -> AsyncIterator[bytes]:
+    size = 0
+    head = b''
+    async for chunk in chunks:
+        if extension == 'zip' and len(head) < 4:
+            head += chunk[:4 - len(head)]
+            if len(head) == 4 and not head.startswith(ZIP_SIGNATURES):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is not a valid zip archive")
+        size += len(chunk)
+        if size > MAX_UPLOAD_SIZE:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File is too large")
+        yield chunk
+
+    if extension == 'zip' and len(head) < 4:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is not a valid zip archive")
+
+
+async def stream_file_to_llm(endpoint: str, filename: str, chunks: AsyncIterator[bytes]):
+    boundary = secrets.token_hex(16)
+
+    async def multipart_body() -> AsyncIterator[bytes]:
+        yield (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode()
+        async for chunk in chunks:
+            yield chunk
+        yield f'\r\n--{boundary}--\r\n'.encode()
+
+    response = await llm_client.post(
+        endpoint,
+        content=multipart_body(),
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}
+    )
+    return response.json()
+
+
+async def send_file_to_llm(filename: str, chunks: AsyncIterator[bytes]):
+    return await stream_file_to_llm('process_doc', filename, chunks)
 
 
 async def request_delete_doc(doc_name: str):
-    async with httpx.AsyncClient() as client:
-        url = "http://gigachat_api:8080/process_delete_doc"
-        response = await client.post(url, json={'doc_name': doc_name}, timeout=10)
-        return response.json()
+    response = await llm_client.post('process_delete_doc', json={'doc_name': doc_name})
+    return response.json()
     
 
 async def request_get_actual_doc_list():
-    async with httpx.AsyncClient() as client:
-        url = "http://gigachat_api:8080/process_get_actual_doc_list"
-        response = await client.post(url, timeout=10)
-        return response.json()
+    response = await llm_client.post('process_get_actual_doc_list')
+    return response.json()
     
 
 async def request_change_doc_name(cur_name: str, new_name: str):
-    async with httpx.AsyncClient() as client:
-        url = "http://gigachat_api:8080/process_change_doc_name"
-        response = await client.post(url, json={'cur_name': cur_name, 'new_name': new_name}, timeout=10)
-        return response.json()
+    response = await llm_client.post('process_change_doc_name', json={'cur_name': cur_name, 'new_name': new_name})
+    return response.json()
     
 
-async def request_add_data(file_path: str):
-    async with httpx.AsyncClient() as client:
-        url = "http://gigachat_api:8080/process_add_data"
-        with open(file_path, "rb") as file:
-            files = {"file": (file.name.split('/')[-1], file, "application/octet-stream")}
-            response = await client.post(url, files=files, timeout=60)
-            return response.json()
+async def request_add_data(filename: str, chunks: AsyncIterator[bytes]):
+    return await stream_file_to_llm('process_add_data', filename, chunks)
 
 
 def is_valid_filename(filename: str) -> bool:
@@ -0,0 +1,107 @@
+import json
+import time
+from collections import OrderedDict
+
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+
+from config.config import (ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_REDIS, ANSWER_CACHE_REDIS_DB,
+                           REDIS_HOST, REDIS_PORT)
+from config.logs import doc_info
+from src.llm_service.utils import normalize_string
+
+
+class AnswerCache:
+    """
+    LRU/TTL cache of process_questions responses keyed by (doc name, normalized question).
+
+    The in-process tier is always on; the Redis tier (one hash per doc) is shared between workers.
+    Cached responses are returned as is, callers must not mutate them.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, redis_url: str | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[str, str], tuple[float, dict]] = OrderedDict()
+        self._redis = aioredis.from_url(redis_url) if redis_url else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _redis_key(filename: str) -> str:
+        return f'answer_cache:{filename}'
+
+    def _get_local(self, key: tuple[str, str]) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _set_local(self, key: tuple[str, str], expires_at: float, response: dict) -> None:
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, filename: str, question: str) -> dict | None:
+        key = (filename, normalize_string(question))
+        response = self._get_local(key)
+
+        if response is None and self._redis is not None:
+            try:
+                raw = await self._redis.hget(self._redis_key(filename), key[1])
+            except RedisError as e:
+                doc_info.warning(f'answer cache: redis is unavailable, {e}')
+                raw = None
+            if raw:
+                entry = json.loads(raw)
+                if entry['expires_at'] >= time.time():
+                    response = entry['response']
+                    self._set_local(key, entry['expires_at'], response)
+
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    async def set(self, filename: str, question: str, response: dict) -> None:
+        key = (filename, normalize_string(question))
+        expires_at = time.time() + self.ttl
+        self._set_local(key, expires_at, response)
+
+        if self._redis is not None:
+            redis_key = self._redis_key(filename)
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(redis_key, key[1], json.dumps({'expires_at': expires_at, 'response': response}))
+                    pipe.expire(redis_key, int(self.ttl))
+                    await pipe.execute()
+            except RedisError as e:
+                doc_info.warning(f'answer cache: redis is unavailable, {e}')
+
+    async def invalidate(self, filename: str) -> None:
+        for key in [key for key in self._entries if key[0] == filename]:
+            del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                await self._redis.delete(self._redis_key(filename))
+            except RedisError as e:
+                doc_info.warning(f'answer cache: redis is unavailable, {e}')
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+
+
+answer_cache = AnswerCache(
+    maxsize=ANSWER_CACHE_SIZE,
+    ttl=ANSWER_CACHE_TTL,
+    redis_url=f'redis://{REDIS_HOST}:{REDIS_PORT}/{ANSWER_CACHE_REDIS_DB}' if ANSWER_CACHE_REDIS else None
+)
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+from src.monitoring.metrics import LLM_COALESCED
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call between concurrent callers with the same key.
+
+    The call runs in its own task, so a caller that goes away does not cancel it for the others.
+    Like cached responses, the shared result must not be mutated by callers.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # retrieved here so an error nobody waits for anymore is not reported as unhandled
+            task.exception()
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable]) -> tuple[object, bool]:
+        """Returns (result, shared); shared is True when the result came from another caller's call."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            LLM_COALESCED.inc(self.name)
+            return await asyncio.shield(task), True
+
+        task = asyncio.create_task(call())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), False
+
+    def in_flight(self) -> int:
+        return len(self._calls)
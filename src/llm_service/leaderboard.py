@@ -0,0 +1,181 @@
+import asyncio
+import itertools
+import secrets
+import time
+from bisect import bisect_left, insort
+from collections import deque, OrderedDict
+from decimal import Decimal
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from config.config import (LEADERBOARD_REFRESH_INTERVAL, LEADERBOARD_PAGE_CACHE_SIZE, DB_REPLICA_MAX_LAG,
+                           DB_REPLICA_CHECK_INTERVAL)
+from database.database import read_session
+from src.auth.models import user
+from src.llm_service.models import contest
+from src.llm_service.schemas import ContestResponse
+
+
+contest_response_list = TypeAdapter(list[ContestResponse])
+
+# generations and versions restart with the process, ETags must not repeat across restarts and workers
+PROCESS_TAG = secrets.token_hex(4)
+
+
+class Leaderboard:
+    """Standings of one contest doc, kept sorted by points desc (ties by user id)."""
+
+    def __init__(self, generation: int = 0, page_cache_size: int = LEADERBOARD_PAGE_CACHE_SIZE):
+        self.generation = generation
+        self.version = 0
+        self.page_cache_size = page_cache_size
+        self._keys: list[tuple[Decimal, int]] = []
+        self._entries: dict[int, dict] = {}
+        self._pages: OrderedDict[tuple[int, int | None], bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _key(user_id: int, points: Decimal) -> tuple[Decimal, int]:
+        return -points, user_id
+
+    def set(self, user_id: int, points: Decimal, total_tests: int, name: str, surname: str) -> bool:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            # awards may be applied out of order, total_tests only grows
+            if entry['total_tests'] > total_tests:
+                return False
+            self._keys.pop(bisect_left(self._keys, self._key(user_id, entry['points'])))
+
+        self._entries[user_id] = {'points': points, 'total_tests': total_tests, 'name': name, 'surname': surname}
+        insort(self._keys, self._key(user_id, points))
+        self.version += 1
+        self._pages.clear()
+        return True
+
+    @property
+    def etag(self) -> str:
+        return f'"{PROCESS_TAG}.{self.generation}.{self.version}"'
+
+    def rank(self, user_id: int) -> int | None:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return bisect_left(self._keys, self._key(user_id, entry['points'])) + 1
+
+    def _response(self, place: int, user_id: int) -> ContestResponse:
+        entry = self._entries[user_id]
+        return ContestResponse(
+            place=place,
+            name=entry['name'],
+            surname=entry['surname'],
+            points=entry['points'],
+            total_tests=entry['total_tests']
+        )
+
+    def page(self, offset: int = 0, limit: int | None = None) -> list[ContestResponse]:
+        end = None if limit is None else offset + limit
+        return [
+            self._response(place, user_id)
+            for place, (_, user_id) in enumerate(self._keys[offset:end], start=offset + 1)
+        ]
+
+    def page_json(self, offset: int = 0, limit: int | None = None) -> bytes:
+        key = (offset, limit)
+        page = self._pages.get(key)
+        if page is None:
+            page = contest_response_list.dump_json(self.page(offset, limit))
+            if self.page_cache_size > 0:
+                self._pages[key] = page
+                if len(self._pages) > self.page_cache_size:
+                    self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(key)
+        return page
+
+    def entry(self, user_id: int) -> ContestResponse | None:
+        place = self.rank(user_id)
+        return self._response(place, user_id) if place else None
+
+
+class LeaderboardEngine:
+    """
+    Contest leaderboards kept in memory and updated as fill_contest awards points.
+
+    A board is rebuilt from the contest table on first use and after LEADERBOARD_REFRESH_INTERVAL
+    seconds, which also picks up awards made by other processes. Rebuilds may read from a replica,
+    so awards of the last `replay_window` seconds are replayed over the loaded rows.
+    """
+
+    def __init__(self, refresh_interval: float, replay_window: float):
+        self.refresh_interval = refresh_interval
+        self.replay_window = replay_window
+        self._boards: dict[str, tuple[float, Leaderboard]] = {}
+        self._recent: dict[str, deque[tuple[float, tuple]]] = {}
+        self._loading: dict[str, list[tuple]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._generations = itertools.count(1)
+
+    async def _load(self, filename: str) -> Leaderboard:
+        query = (
+            select(
+                contest.c.user_id,
+                contest.c.points,
+                contest.c.total_tests,
+                user.c.name,
+                user.c.surname
+            )
+            .join(user, user.c.id == contest.c.user_id)
+            .where(contest.c.doc_name == filename)
+        )
+
+        self._loading[filename] = []
+        try:
+            async with read_session() as session:
+                records = (await session.execute(query)).fetchall()
+
+            board = Leaderboard(generation=next(self._generations))
+            for record in records:
+                board.set(record.user_id, record.points, record.total_tests, record.name, record.surname)
+            # set() ignores awards older than the loaded rows
+            for _, award in self._recent.get(filename, ()):
+                board.set(*award)
+            for award in self._loading[filename]:
+                board.set(*award)
+        finally:
+            del self._loading[filename]
+        return board
+
+    def _is_fresh(self, filename: str) -> bool:
+        loaded = self._boards.get(filename)
+        return loaded is not None and (self.refresh_interval <= 0 or
+                                       time.monotonic() - loaded[0] < self.refresh_interval)
+
+    async def get(self, filename: str) -> Leaderboard:
+        if not self._is_fresh(filename):
+            async with self._locks.setdefault(filename, asyncio.Lock()):
+                if not self._is_fresh(filename):
+                    self._boards[filename] = (time.monotonic(), await self._load(filename))
+        return self._boards[filename][1]
+
+    def award(self, filename: str, user_id: int, points: Decimal, total_tests: int, name: str, surname: str) -> None:
+        """Apply the contest row totals returned by fill_contest, after its transaction committed."""
+        award = (user_id, points, total_tests, name, surname)
+        now = time.monotonic()
+        recent = self._recent.setdefault(filename, deque())
+        recent.append((now, award))
+        while recent and recent[0][0] < now - self.replay_window:
+            recent.popleft()
+        if filename in self._loading:
+            self._loading[filename].append(award)
+        if filename in self._boards:
+            self._boards[filename][1].set(*award)
+
+
+leaderboards = LeaderboardEngine(
+    refresh_interval=LEADERBOARD_REFRESH_INTERVAL,
+    # a replica found fresh enough can fall behind further until the next check
+    replay_window=DB_REPLICA_MAX_LAG + DB_REPLICA_CHECK_INTERVAL
+)
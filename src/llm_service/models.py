@@ -1,4 +1,5 @@
-from sqlalchemy import Table, Column, Integer, String, MetaData, ForeignKey, DateTime, JSON, Numeric, Boolean
+from sqlalchemy import (Table, Column, Integer, BigInteger, String, MetaData, ForeignKey, DateTime, Date, JSON, Numeric,
+                        Boolean, Index, UniqueConstraint, text)
 from src.auth.models import user
 
 metadata = MetaData()
@@ -16,7 +17,10 @@ request_statistic = Table(
     Column("embedding_tokens", Integer, nullable=True, default=0),
     Column("total_time", Numeric(precision=10, scale=3), nullable=False),
     Column("gigachat_time", Numeric(precision=10, scale=3)),
-    Column("from_cache", Boolean, nullable=True)
+    Column("from_cache", Boolean, nullable=True),
+    Index("ix_request_statistic_user_id_received_at", "user_id", "received_at"),
+    Index("ix_request_statistic_user_id_operation_doc_name", "user_id", "operation", "doc_name", "received_at"),
+    Index("ix_request_statistic_doc_name", "doc_name"),
 )
 
 feedback = Table(
@@ -26,6 +30,9 @@ feedback = Table(
     Column("value", String),
     Column("user_comment", String, nullable=True),
     Column("request_id", Integer, ForeignKey(request_statistic.c.id)),
+    Column("viewed", Boolean, nullable=False, default=False, server_default=text("false")),
+    Index("ix_feedback_not_viewed", "id", postgresql_where=text("viewed = false")),
+    Index("ix_feedback_request_id", "request_id"),
 )
 
 test_system = Table(
@@ -41,6 +48,8 @@ test_system = Table(
     Column("right_answer", String, nullable=False),
     Column("generation_attempts", Integer, nullable=True),
     Column("answered_at", DateTime, nullable=True, default=None),
+    Column("question_fingerprint", String(32), nullable=True),
+    Index("ix_test_system_request_id", "request_id"),
 )
 
 
@@ -52,6 +61,9 @@ answer_question_system = Table(
     Column("question", String, nullable=False),
     Column("answer", String, nullable=False),
     Column("metrics", JSON, nullable=True),
+    Column("question_fingerprint", String(32), nullable=True),
+    Index("ix_answer_question_system_request_id", "request_id"),
+    Index("ix_answer_question_system_question_fingerprint", "question_fingerprint", "request_id"),
 )
 
 contest = Table(
@@ -64,5 +76,33 @@ contest = Table(
     Column("cheat_tests", Integer, nullable=True),
     Column("answer_question_feedbacks", Integer, nullable=True, default=0),
     Column("test_feedbacks", Integer, nullable=True, default=0),
-    Column("points", Numeric(precision=4, scale=1), nullable=False)
+    Column("points", Numeric(precision=4, scale=1), nullable=False),
+    UniqueConstraint("user_id", "doc_name", name="uq_contest_user_id_doc_name"),
+)
+
+
+user_daily_tokens = Table(
+    "user_daily_tokens",
+    metadata,
+    Column("user_id", Integer, ForeignKey(user.c.id), primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("tokens", Integer, nullable=False, default=0),
+)
+
+
+# hourly and daily sums of request_statistic, doc_name '' and user_id 0 stand for NULL
+token_usage_rollup = Table(
+    "token_usage_rollup",
+    metadata,
+    Column("granularity", String, primary_key=True),
+    Column("bucket", DateTime, primary_key=True),
+    Column("operation", String, primary_key=True),
+    Column("doc_name", String, primary_key=True),
+    Column("user_id", Integer, primary_key=True),
+    Column("requests", Integer, nullable=False, default=0),
+    Column("tokens", BigInteger, nullable=False, default=0),
+    Column("embedding_tokens", BigInteger, nullable=False, default=0),
+    Column("total_time", Numeric(precision=14, scale=3), nullable=False, default=0),
+    Column("gigachat_time", Numeric(precision=14, scale=3), nullable=False, default=0),
+    Column("cache_hits", Integer, nullable=False, default=0),
 )
@@ -1,5 +1,10 @@
+import json
+import time
 from datetime import datetime
+
+import httpx
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, update
 
@@ -7,15 +12,23 @@ from database.database import get_async_session
 from src.llm_service.contest import fill_contest, CONTEST_DATAPK, CONTEST_DATAPK_ITM
 from src.auth.models import AuthUser
 from src.llm_service.schemas import Feedback, CheckTest
-from src.llm_service.utils import send_data_to_llm, convert_time
+from src.llm_service.utils import send_data_to_llm, convert_time, normalize_string
 from src.docs.models import doc
 from src.llm_service.models import contest
 from src.llm_service.models import test_system, request_statistic
-from src.llm_service.statistics import add_statistic_row, add_feedback_row
+from src.llm_service.statistics import add_statistic_row, add_feedback_row, statistics_writer
+from src.llm_service.cache import answer_cache
+from src.llm_service.test_pool import test_pool
+from src.llm_service.coalescing import SingleFlight
+from src.llm_service.leaderboard import leaderboards
+from src.services.llm_client import llm_client
+from src.monitoring.metrics import LLM_TIME_TO_FIRST_TOKEN
 from src.auth.auth_config import current_verified_user
 
 router = APIRouter()
 
+questions_flight = SingleFlight('process_questions')
+
 
 @router.post("/get_answer")
 async def send_data(
@@ -24,14 +37,39 @@ async def send_data(
     current_user: AuthUser = Depends(current_verified_user),
     session: AsyncSession = Depends(get_async_session)
 ):
+    start_time = time.perf_counter()
     data = {'filename': filename,
             'question': question}
     
     query = select(doc).where(doc.c.name == filename)
     if not (await session.execute(query)).fetchone():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document with this name was not found")
-    
-    response = await send_data_to_llm('process_questions', data)
+    # ends the read transaction, so no pool connection is held while gigachat_api answers
+    await session.commit()
+
+    response = await answer_cache.get(filename, question)
+    cached = shared = response is not None
+    if not cached:
+        response, shared = await questions_flight.do(
+            (filename, normalize_string(question)),
+            lambda: send_data_to_llm('process_questions', data)
+        )
+        if not shared and 'result' in response:
+            await answer_cache.set(filename, question, response)
+
+    if shared and 'result' in response:
+        # tokens were spent (and counted) by the request that made the call, a coalesced request
+        # is not a cache hit and is counted in llm_coalesced_requests_total instead
+        response = {
+            **response,
+            'result': {**response['result'], 'question': question},
+            'tokens': 0,
+            'embedding_tokens': 0,
+            'total_time': round(time.perf_counter() - start_time, 3),
+            'gigachat_time': 0,
+            'from_cache': cached
+        }
+
     request_id = await add_statistic_row(
         current_user=current_user,
         operation='get_answer',
@@ -43,8 +81,7 @@ async def send_data(
         metrics=response['metrics'],
         gigachat_time=response['gigachat_time'],
         from_cache=response['from_cache'],
-        response=response['result'],
-        session=session
+        response=response['result']
     )
     result = {'result': response['result'],
               'request_id': request_id}
@@ -53,14 +90,117 @@ async def send_data(
     return result
 
 
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream_answer(filename: str, question: str, current_user: AuthUser):
+    """
+    Proxies process_questions_stream (NDJSON: {"token": ...} lines, then the full process_questions
+    response) as SSE token events, and writes the statistic row before the final result event.
+    """
+    start_time = time.perf_counter()
+    response = await answer_cache.get(filename, question)
+    if response is not None:
+        LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start_time, 'answer_cache')
+        yield sse_event('token', {'token': response['result']['answer']})
+        response = {
+            **response,
+            'result': {**response['result'], 'question': question},
+            'tokens': 0,
+            'embedding_tokens': 0,
+            'total_time': round(time.perf_counter() - start_time, 3),
+            'gigachat_time': 0,
+            'from_cache': True
+        }
+    else:
+        data = {'filename': filename, 'question': question}
+        try:
+            async with llm_client.stream('process_questions_stream', json=data) as llm_response:
+                if llm_response.status_code != status.HTTP_200_OK:
+                    await llm_response.aread()
+                    yield sse_event('error', {'detail': llm_response.text})
+                    return
+                first_token = True
+                async for line in llm_response.aiter_lines():
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if 'token' in message:
+                        if first_token:
+                            LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start_time,
+                                                            'process_questions_stream')
+                            first_token = False
+                        yield sse_event('token', {'token': message['token']})
+                    else:
+                        response = message
+        except HTTPException as e:
+            yield sse_event('error', {'detail': e.detail})
+            return
+        except (httpx.HTTPError, ValueError) as e:
+            # the 200 SSE response has started, so failures can only be reported as an event
+            yield sse_event('error', {'detail': f'LLM stream failed: {e!r}'})
+            return
+
+        if response is None or 'result' not in response:
+            yield sse_event('error', {'detail': response or 'stream ended without a result'})
+            return
+        await answer_cache.set(filename, question, response)
+
+    request_id = await add_statistic_row(
+        current_user=current_user,
+        operation='get_answer',
+        prompt_path=response['prompt_path'],
+        filename=filename,
+        tokens=response['tokens'],
+        embedding_tokens=response['embedding_tokens'],
+        total_time=response['total_time'],
+        metrics=response['metrics'],
+        gigachat_time=response['gigachat_time'],
+        from_cache=response['from_cache'],
+        response=response['result']
+    )
+    yield sse_event('result', {'result': response['result'], 'request_id': request_id})
+
+
+@router.post("/get_answer_stream")
+async def send_data_stream(
+    filename: str,
+    question: str,
+    current_user: AuthUser = Depends(current_verified_user),
+    session: AsyncSession = Depends(get_async_session)
+):
+    query = select(doc).where(doc.c.name == filename)
+    if not (await session.execute(query)).fetchone():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document with this name was not found")
+
+    return StreamingResponse(
+        stream_answer(filename, question, current_user),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @router.post("/get_test")
 async def send_data(
     filename: str,
     current_user: AuthUser = Depends(current_verified_user),
     session: AsyncSession = Depends(get_async_session)
 ):
+    start_time = time.perf_counter()
     data = {'filename': filename}
-    response = await send_data_to_llm('process_data', data)
+    generation = test_pool.generation(filename)
+    response = test_pool.pop(filename)
+    pooled = response is not None
+    if not pooled:
+        # the user may have been loaded on this session, give its connection back before generating
+        await session.commit()
+        response = await send_data_to_llm('process_data', data)
+    if 'result' in response:
+        test_pool.refill(filename, generation)
+
+    # a pooled test is recorded with this request's latency, gigachat_time stays the generation time;
+    # it is not an answer cache hit, its tokens were spent for this request
     request_id = await add_statistic_row(
         current_user=current_user,
         operation='get_test',
@@ -68,12 +208,11 @@ async def send_data(
         filename=filename,
         tokens=response['tokens'],
         embedding_tokens=0,
-        total_time=response['total_time'],
+        total_time=round(time.perf_counter() - start_time, 3) if pooled else response['total_time'],
         metrics=None,
         gigachat_time=response['gigachat_time'],
         from_cache=False,
-        response=response['result']['result'],
-        session=session
+        response=response['result']['result']
     )
     result = response['result']
     result['request_id'] = request_id
@@ -87,40 +226,39 @@ async def check_test(
     user: AuthUser = Depends(current_verified_user),
     session: AsyncSession = Depends(get_async_session)
 ):
+    await statistics_writer.wait_persisted(check_data.request_id)
 
-    query = select(
-        test_system.c.right_answer
+    # marks the test answered and fetches everything scoring needs in one statement,
+    # a concurrent second answer finds answered_at set and gets no row
+    answer_stmt = update(
+        test_system
     ).where(
-        and_(      
+        and_(
             test_system.c.request_id == check_data.request_id,
-            test_system.c.answered_at.is_(None)
+            test_system.c.answered_at.is_(None),
+            request_statistic.c.id == test_system.c.request_id
         )
-    )
-    current_answer = (await session.execute(query)).fetchone()
-    if not current_answer:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Question is not exist or already answered')
-    
-    query = select(
-        request_statistic.c.doc_name
-    ).where(
-        request_statistic.c.id == check_data.request_id
-    )
-    doc_name = (await session.execute(query)).fetchone()[0]
-
-    update_stmt = update(
-        test_system
-    ).where(
-        test_system.c.request_id == check_data.request_id
     ).values(
         answered_at=convert_time(datetime.now())
+    ).returning(
+        test_system.c.right_answer,
+        test_system.c.question,
+        test_system.c.question_fingerprint,
+        test_system.c.answered_at,
+        request_statistic.c.doc_name,
+        request_statistic.c.received_at
     )
+    answer = (await session.execute(answer_stmt)).fetchone()
+    if not answer:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Question is not exist or already answered')
 
-    await session.execute(update_stmt)
+    contest_totals = await fill_contest(session, user, check_data.selected_option, answer)
     await session.commit()
 
-    await fill_contest(session, user, doc_name, check_data.selected_option, current_answer[0], check_data.request_id)
+    if contest_totals:
+        leaderboards.award(answer.doc_name, user.id, *contest_totals, user.name, user.surname)
 
-    return {'right_answer': current_answer[0]}
+    return {'right_answer': answer.right_answer}
 
 
 @router.post("/send_feedback")
@@ -129,6 +267,7 @@ async def send_feedback(
     current_user: AuthUser = Depends(current_verified_user),
     session: AsyncSession = Depends(get_async_session)
 ):
+    await statistics_writer.wait_persisted(feedback.request_id)
     await add_feedback_row(
         value=feedback.value,
         user_comment=feedback.user_comment,
@@ -1,17 +1,26 @@
-from datetime import datetime
+import asyncio
+from collections import deque, defaultdict
+from datetime import datetime, date, time
 
-from sqlalchemy import insert, select, func, and_
+from sqlalchemy import insert, select, func, and_, Sequence
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, DataError
 
 from src.auth.models import AuthUser
-from src.llm_service.models import request_statistic, feedback, test_system, answer_question_system
-from src.llm_service.utils import convert_time
+from src.llm_service.models import (request_statistic, feedback, test_system, answer_question_system,
+                                    user_daily_tokens, token_usage_rollup)
+from src.llm_service.utils import convert_time, question_fingerprint
 from src.services.celery_service import send_email
-from config.config import SEND_ADMIN_NOTICES
+from src.monitoring.metrics import LLM_RESPONSES, LLM_TOKENS
+from database.database import async_session_maker
+from config.config import (SEND_ADMIN_NOTICES, DAILY_TOKEN_LIMIT, STATISTICS_QUEUE_SIZE, STATISTICS_BATCH_SIZE, STATISTICS_PUT_TIMEOUT,
+                           STATISTICS_ID_BLOCK, STATISTICS_WAIT_TIMEOUT, STATISTICS_WRITE_RETRIES, STATISTICS_RETRY_DELAY)
+from config.logs import doc_info
 
 
-async def add_statistic_row(
+def build_statistic_row(
+        request_id: int,
         current_user: AuthUser,
         operation: str,
         prompt_path: str,
@@ -22,113 +31,357 @@ async def add_statistic_row(
         metrics: list | None,
         gigachat_time: float,
         from_cache: bool,
-        response: dict,
-        session: AsyncSession
-) -> int:
-    try:
-        stmt = insert(request_statistic).values(
-            user_id=current_user.id,
-            received_at=convert_time(datetime.now()),
-            operation=operation,
-            prompt_path=prompt_path,
-            doc_name=filename,
-            tokens=tokens,
-            embedding_tokens=embedding_tokens,
-            total_time=total_time,
-            gigachat_time=gigachat_time,
-            from_cache=from_cache
-        )
-        await session.execute(stmt)
-        await session.commit()
+        response: dict
+) -> dict:
+    statistic = {
+        'id': request_id,
+        'user_id': current_user.id,
+        'received_at': convert_time(datetime.now()),
+        'operation': operation,
+        'prompt_path': prompt_path,
+        'doc_name': filename,
+        'tokens': tokens,
+        'embedding_tokens': embedding_tokens,
+        'total_time': total_time,
+        'gigachat_time': gigachat_time,
+        'from_cache': from_cache
+    }
+    if operation == 'get_answer':
+        child = {
+            'request_id': request_id,
+            'question': response['question'],
+            'answer': response['answer'],
+            'metrics': metrics,
+            'question_fingerprint': question_fingerprint(response['question'])
+        }
+    else:
+        child = {
+            'request_id': request_id,
+            'question': response['question'],
+            'option_1': response['1 option'],
+            'option_2': response['2 option'],
+            'option_3': response['3 option'],
+            'option_4': response['4 option'],
+            'right_answer': response['right answer'],
+            'generation_attempts': response['generation_attemps'],
+            'question_fingerprint': question_fingerprint(response['question'])
+        }
+    # a copy, the caller may change its response (/get_test hides the right answer) before notices run
+    return {'statistic': statistic, 'child': child, 'user': current_user, 'response': dict(response)}
 
-        last_row = await session.execute(select(request_statistic).order_by(request_statistic.c.id.desc()).limit(1))
-        last_id = last_row.scalar()
 
-        if metrics:
-            stmt = insert(answer_question_system).values(
-                request_id=last_id,
-                question=response['question'],
-                answer=response['answer'],
-                metrics=metrics
-            )
-        else:
-            stmt = insert(test_system).values(
-                request_id=last_id,
-                question=response['question'],
-                option_1=response['1 option'],
-                option_2=response['2 option'],
-                option_3=response['3 option'],
-                option_4=response['4 option'],
-                right_answer=response['right answer'],
-                generation_attempts=response['generation_attemps']
-            )
-        await session.execute(stmt)
-        await session.commit()
+ROLLUP_GRANULARITIES = {
+    'hour': lambda received_at: received_at.replace(minute=0, second=0, microsecond=0),
+    'day': lambda received_at: received_at.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+ROLLUP_SUMS = ('requests', 'tokens', 'embedding_tokens', 'total_time', 'gigachat_time', 'cache_hits')
 
-        if SEND_ADMIN_NOTICES:
-            DAILY_TOKEN_LIMIT = 63000
 
-            start_of_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+def rollup_rows(rows: list[dict]) -> list[dict]:
+    sums = defaultdict(lambda: dict.fromkeys(ROLLUP_SUMS, 0))
+    for row in rows:
+        statistic = row['statistic']
+        for granularity, truncate in ROLLUP_GRANULARITIES.items():
+            key = (granularity, truncate(statistic['received_at']), statistic['operation'],
+                   statistic['doc_name'] or '', statistic['user_id'] or 0)
+            bucket = sums[key]
+            bucket['requests'] += 1
+            bucket['tokens'] += statistic['tokens'] or 0
+            bucket['embedding_tokens'] += statistic['embedding_tokens'] or 0
+            bucket['total_time'] += statistic['total_time'] or 0
+            bucket['gigachat_time'] += statistic['gigachat_time'] or 0
+            bucket['cache_hits'] += 1 if statistic['from_cache'] else 0
+    # a fixed key order keeps concurrent upserts of the same buckets from deadlocking
+    return [
+        {'granularity': granularity, 'bucket': bucket, 'operation': operation, 'doc_name': doc_name,
+         'user_id': user_id, **sums[(granularity, bucket, operation, doc_name, user_id)]}
+        for granularity, bucket, operation, doc_name, user_id in sorted(sums)
+    ]
 
-            query = select(func.sum(request_statistic.c.tokens)).where(
-                and_(
-                    request_statistic.c.user_id == current_user.id,
-                    request_statistic.c.received_at >= start_of_day
-                )
+
+async def write_statistic_rows(session: AsyncSession, rows: list[dict]) -> dict[tuple[int, date], tuple[int, int]]:
+    """Insert a batch in one transaction, returns {(user_id, day): (tokens today, tokens added)}."""
+    await session.execute(insert(request_statistic).values([row['statistic'] for row in rows]))
+
+    answers = [row['child'] for row in rows if row['statistic']['operation'] == 'get_answer']
+    tests = [row['child'] for row in rows if row['statistic']['operation'] != 'get_answer']
+    if answers:
+        await session.execute(insert(answer_question_system).values(answers))
+    if tests:
+        await session.execute(insert(test_system).values(tests))
+
+    added_tokens = defaultdict(int)
+    for row in rows:
+        statistic = row['statistic']
+        added_tokens[(statistic['user_id'], statistic['received_at'].date())] += statistic['tokens']
+
+    stmt = pg_insert(user_daily_tokens).values(
+        [{'user_id': user_id, 'day': day, 'tokens': tokens} for (user_id, day), tokens in added_tokens.items()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[user_daily_tokens.c.user_id, user_daily_tokens.c.day],
+        set_={'tokens': user_daily_tokens.c.tokens + stmt.excluded.tokens}
+    ).returning(user_daily_tokens.c.user_id, user_daily_tokens.c.day, user_daily_tokens.c.tokens)
+    daily_tokens = {
+        (user_id, day): (tokens, added_tokens[(user_id, day)])
+        for user_id, day, tokens in (await session.execute(stmt)).fetchall()
+    }
+
+    stmt = pg_insert(token_usage_rollup).values(rollup_rows(rows))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[token_usage_rollup.c.granularity, token_usage_rollup.c.bucket, token_usage_rollup.c.operation,
+                        token_usage_rollup.c.doc_name, token_usage_rollup.c.user_id],
+        set_={column: token_usage_rollup.c[column] + stmt.excluded[column] for column in ROLLUP_SUMS}
+    )
+    await session.execute(stmt)
+
+    await session.commit()
+    return daily_tokens
+
+
+async def send_admin_notices(
+        session: AsyncSession,
+        rows: list[dict],
+        daily_tokens: dict[tuple[int, date], tuple[int, int]]
+) -> None:
+    users = {row['statistic']['user_id']: row['user'] for row in rows}
+
+    for (user_id, day), (spent_tokens_today, added_tokens) in daily_tokens.items():
+        if not (spent_tokens_today >= DAILY_TOKEN_LIMIT and spent_tokens_today - added_tokens < DAILY_TOKEN_LIMIT):
+            continue
+
+        current_user = users[user_id]
+        start_of_day = datetime.combine(day, time.min)
+        query = select(
+        request_statistic.c.doc_name,
+        func.sum(request_statistic.c.tokens).label('total_tokens')
+        ).where(
+            and_(
+                request_statistic.c.user_id == user_id,
+                request_statistic.c.received_at >= start_of_day
             )
-            spent_tokens_today = (await session.execute(query)).fetchone()[0]
-
-            if spent_tokens_today >= DAILY_TOKEN_LIMIT and spent_tokens_today - tokens < DAILY_TOKEN_LIMIT:
-                query = select(
-                request_statistic.c.doc_name,
-                func.sum(request_statistic.c.tokens).label('total_tokens')
-                ).where(
-                    and_(
-                        request_statistic.c.user_id == current_user.id,
-                        request_statistic.c.received_at >= start_of_day
-                    )
-                ).group_by(
-                    request_statistic.c.doc_name
-                )
+        ).group_by(
+            request_statistic.c.doc_name
+        )
+
+        result = (await session.execute(query)).fetchall()
+        tokens_by_doc_name = {row[0]: row[1] for row in result}
 
-                result = (await session.execute(query)).fetchall()
-                tokens_by_doc_name = {row[0]: row[1] for row in result}
+        send_email.delay(
+            name=current_user.name,
+            surname=current_user.surname,
+            user_email=current_user.email,
+            tokens_by_doc=tokens_by_doc_name,
+            destiny='token_limit'
+        )
+
+    for row in rows:
+        statistic, response = row['statistic'], row['response']
+        operation, filename, tokens = statistic['operation'], statistic['doc_name'], statistic['tokens']
+        total_time, gigachat_time = statistic['total_time'], statistic['gigachat_time']
 
+        if total_time > 15:
+            if operation == 'get_answer':
+                send_email.delay(
+                    filename=filename,
+                    tokens=tokens,
+                    total_time=total_time,
+                    gigachat_time=gigachat_time,
+                    question=response['question'],
+                    answer=response['answer'],
+                    destiny='qa_time_limit'
+                )
+            elif operation == 'get_test':
                 send_email.delay(
-                    name=current_user.name,
-                    surname=current_user.surname,
-                    user_email=current_user.email,
-                    tokens_by_doc=tokens_by_doc_name,
-                    destiny='token_limit'
+                    filename=filename,
+                    tokens=tokens,
+                    total_time=total_time,
+                    gigachat_time=gigachat_time,
+                    generation_attemps=response['generation_attemps'],
+                    question=response['question'],
+                    options='<br>'.join([f'{i}) {response[f"{i} option"]}' for i in range(1, 5)]),
+                    right_answer=response['right answer'],
+                    destiny='test_time_limit'
                 )
 
-            if total_time > 15:
-                if operation == 'get_answer':
-                    send_email.delay(
-                        filename=filename,
-                        tokens=tokens, 
-                        total_time=total_time, 
-                        gigachat_time=gigachat_time, 
-                        question=response['question'], 
-                        answer=response['answer'],
-                        destiny='qa_time_limit'
-                    )
-                elif operation == 'get_test':
-                    send_email.delay(
-                        filename=filename,
-                        tokens=tokens, 
-                        total_time=total_time, 
-                        gigachat_time=gigachat_time,
-                        generation_attemps=response['generation_attemps'],
-                        question=response['question'],
-                        options='<br>'.join([f'{i}) {response[f"{i} option"]}' for i in range(1, 5)]),
-                        right_answer=response['right answer'],
-                        destiny='test_time_limit'
+
+class StatisticsWriter:
+    """
+    Write-behind pipeline for request_statistic and its child rows.
+
+    Ids are reserved from the table sequence in blocks, so endpoints get their request_id
+    without a round trip. Rows are queued and written in multi-row batches by one drain task.
+    A batch rejected because of a bad row is split in halves until the bad rows are isolated,
+    other failures are retried `write_retries` times before the batch is dropped.
+    """
+
+    def __init__(
+        self,
+        queue_size: int,
+        batch_size: int,
+        put_timeout: float,
+        id_block: int,
+        write_retries: int,
+        retry_delay: float
+    ):
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.id_block = id_block
+        self.write_retries = write_retries
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=queue_size)
+        self._ids: deque[int] = deque()
+        self._id_lock = asyncio.Lock()
+        self._pending: dict[int, asyncio.Future] = {}
+        self._task: asyncio.Task | None = None
+        self.written_rows = 0
+        self.dropped_rows = 0
+        self.failed_batches = 0
+
+    async def reserve_id(self) -> int:
+        if not self._ids:
+            async with self._id_lock:
+                if not self._ids:
+                    query = select(Sequence('request_statistic_id_seq').next_value()).select_from(
+                        func.generate_series(1, self.id_block)
                     )
+                    async with async_session_maker() as session:
+                        self._ids.extend((await session.execute(query)).scalars().all())
+        return self._ids.popleft()
 
-        return last_id
-    except IntegrityError as e:
-        print(e)
+    async def submit(self, row: dict) -> None:
+        request_id = row['statistic']['id']
+        self._pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put(row), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            self.dropped_rows += 1
+            self._resolve([row])
+            doc_info.error(f'statistics queue is full, request #{request_id} was dropped')
+
+    async def wait_persisted(self, request_id: int, timeout: float = STATISTICS_WAIT_TIMEOUT) -> None:
+        future = self._pending.get(request_id)
+        if future is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        await self._queue.join()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _resolve(self, rows: list[dict]) -> None:
+        for row in rows:
+            future = self._pending.pop(row['statistic']['id'], None)
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write(batch)
+            finally:
+                self._resolve(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: list[dict], retries: int | None = None) -> None:
+        if retries is None:
+            retries = self.write_retries
+        try:
+            async with async_session_maker() as session:
+                daily_tokens = await write_statistic_rows(session, batch)
+        except (IntegrityError, DataError) as e:
+            self.failed_batches += 1
+            if len(batch) == 1:
+                self.dropped_rows += 1
+                self._resolve(batch)
+                doc_info.error(f"statistic row #{batch[0]['statistic']['id']} was dropped: {e!r}")
+                return
+            doc_info.warning(f'statistics batch of {len(batch)} rows failed, writing it in halves: {e!r}')
+            middle = len(batch) // 2
+            await self._write(batch[:middle], retries)
+            await self._write(batch[middle:], retries)
+            return
+        except Exception as e:
+            self.failed_batches += 1
+            if retries > 0:
+                doc_info.warning(f'statistics batch of {len(batch)} rows failed, retrying: {e!r}')
+                await asyncio.sleep(self.retry_delay)
+                await self._write(batch, retries - 1)
+                return
+            self.dropped_rows += len(batch)
+            self._resolve(batch)
+            doc_info.error(f'statistics batch of {len(batch)} rows was dropped: {e!r}')
+            return
+
+        self._resolve(batch)
+        self.written_rows += len(batch)
+        if SEND_ADMIN_NOTICES:
+            try:
+                async with async_session_maker() as session:
+                    await send_admin_notices(session, batch, daily_tokens)
+            except Exception as e:
+                doc_info.error(f'admin notices for a statistics batch failed: {e!r}')
+
+
+statistics_writer = StatisticsWriter(
+    queue_size=STATISTICS_QUEUE_SIZE,
+    batch_size=STATISTICS_BATCH_SIZE,
+    put_timeout=STATISTICS_PUT_TIMEOUT,
+    id_block=STATISTICS_ID_BLOCK,
+    write_retries=STATISTICS_WRITE_RETRIES,
+    retry_delay=STATISTICS_RETRY_DELAY
+)
+
+
+async def add_statistic_row(
+        current_user: AuthUser,
+        operation: str,
+        prompt_path: str,
+        filename: str,
+        tokens: int,
+        embedding_tokens: int,
+        total_time: float,
+        metrics: list | None,
+        gigachat_time: float,
+        from_cache: bool,
+        response: dict
+) -> int:
+    request_id = await statistics_writer.reserve_id()
+    row = build_statistic_row(
+        request_id=request_id,
+        current_user=current_user,
+        operation=operation,
+        prompt_path=prompt_path,
+        filename=filename,
+        tokens=tokens,
+        embedding_tokens=embedding_tokens,
+        total_time=total_time,
+        metrics=metrics,
+        gigachat_time=gigachat_time,
+        from_cache=from_cache,
+        response=response
+    )
+    await statistics_writer.submit(row)
+    LLM_RESPONSES.inc(operation, from_cache)
+    LLM_TOKENS.inc(operation, 'llm', amount=tokens or 0)
+    LLM_TOKENS.inc(operation, 'embedding', amount=embedding_tokens or 0)
+    return request_id
 
 
 async def add_feedback_row(
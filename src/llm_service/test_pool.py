@@ -0,0 +1,97 @@
+import asyncio
+from collections import deque
+
+from config.config import TEST_POOL_WATERMARK, TEST_POOL_CONCURRENCY, TEST_POOL_RETRY_DELAY, TEST_POOL_MAX_FAILURES
+from config.logs import doc_info
+from src.llm_service.utils import send_data_to_llm
+
+
+class TestPool:
+    """
+    Per-doc pool of pre-generated process_data responses.
+
+    A producer task per doc keeps the pool filled up to the watermark. Producers are started
+    by refill() after a successful /get_test, so unknown doc names never get one. drop() bumps
+    the doc generation, so a /get_test that started before it does not restart the producer.
+    """
+
+    def __init__(self, watermark: int, concurrency: int, retry_delay: float, max_failures: int):
+        self.watermark = watermark
+        self.retry_delay = retry_delay
+        self.max_failures = max_failures
+        self._pools: dict[str, deque[dict]] = {}
+        self._wakeups: dict[str, asyncio.Event] = {}
+        self._producers: dict[str, asyncio.Task] = {}
+        self._generations: dict[str, int] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def pop(self, filename: str) -> dict | None:
+        pool = self._pools.get(filename)
+        return pool.popleft() if pool else None
+
+    def generation(self, filename: str) -> int:
+        return self._generations.get(filename, 0)
+
+    def refill(self, filename: str, generation: int) -> None:
+        if self.watermark <= 0 or generation != self.generation(filename):
+            return
+        producer = self._producers.get(filename)
+        if producer is None or producer.done():
+            self._pools.setdefault(filename, deque())
+            self._wakeups[filename] = asyncio.Event()
+            self._producers[filename] = asyncio.create_task(self._produce(filename))
+        self._wakeups[filename].set()
+
+    def drop(self, filename: str) -> None:
+        self._generations[filename] = self.generation(filename) + 1
+        producer = self._producers.pop(filename, None)
+        if producer is not None:
+            producer.cancel()
+        self._pools.pop(filename, None)
+        self._wakeups.pop(filename, None)
+
+    def depth(self) -> dict[str, int]:
+        return {filename: len(pool) for filename, pool in self._pools.items()}
+
+    async def close(self) -> None:
+        producers = list(self._producers.values())
+        for producer in producers:
+            producer.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+        self._producers.clear()
+
+    async def _produce(self, filename: str) -> None:
+        pool = self._pools[filename]
+        wakeup = self._wakeups[filename]
+        failures = 0
+
+        while failures < self.max_failures:
+            if len(pool) >= self.watermark:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+
+            async with self._semaphore:
+                try:
+                    response = await send_data_to_llm('process_data', {'filename': filename})
+                except Exception as e:
+                    response = {'error': repr(e)}
+
+            if 'result' not in response:
+                failures += 1
+                doc_info.warning(f'test pool: generation for {filename} failed, {response}')
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            failures = 0
+            pool.append(response)
+
+        doc_info.error(f'test pool: producer for {filename} stopped after {failures} failures')
+
+
+test_pool = TestPool(
+    watermark=TEST_POOL_WATERMARK,
+    concurrency=TEST_POOL_CONCURRENCY,
+    retry_delay=TEST_POOL_RETRY_DELAY,
+    max_failures=TEST_POOL_MAX_FAILURES
+)
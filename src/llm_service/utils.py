@@ -1,22 +1,37 @@
-import httpx
+import hashlib
 import pytz
+import string
 from datetime import datetime
 
 from src.auth.models import user
 from src.llm_service.schemas import ContestResponse
 from src.llm_service.models import contest
+from src.services.llm_client import llm_client
+from src.monitoring.metrics import LLM_BACKEND_TOTAL_TIME, LLM_BACKEND_GIGACHAT_TIME
 
 
 
 async def send_data_to_llm(endpoint: str, data: dict):
-    async with httpx.AsyncClient(timeout=150) as client:
-        url = f"http://gigachat_api:8080/{endpoint}"
-        response = await client.post(url, json=data)
-        return response.json()
+    response = await llm_client.post(endpoint, json=data)
+    result = response.json()
+    if isinstance(result, dict):
+        if isinstance(result.get('total_time'), (int, float)):
+            LLM_BACKEND_TOTAL_TIME.observe(result['total_time'], endpoint)
+        if isinstance(result.get('gigachat_time'), (int, float)):
+            LLM_BACKEND_GIGACHAT_TIME.observe(result['gigachat_time'], endpoint)
+    return result
 
 
 
 
+def normalize_string(s: str) -> str:
+    return ''.join(char.lower() for char in s if char not in string.punctuation).replace(' ', '')
+
+
+def question_fingerprint(question: str) -> str:
+    return hashlib.md5(normalize_string(question).encode()).hexdigest()
+
+
 def convert_time(cur_time: str | datetime) -> datetime:
     if isinstance(cur_time, str):
         time_utc = datetime.fromisoformat(cur_time.rstrip("Z"))
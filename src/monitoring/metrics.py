@@ -0,0 +1,214 @@
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 150)
+
+REGISTRY: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: tuple[str, ...], labels: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = defaultdict(float)
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self._values[labels] += amount
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in list(self._values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # one extra slot for +Inf
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = defaultdict(float)
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, counts in list(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_str} {self._sums[labels]}')
+            lines.append(f'{self.name}_count{label_str} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Value read at scrape time from callback, which returns a number or {labels tuple: number}."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], float | dict],
+        labelnames: tuple[str, ...] = (),
+        metric_type: str = 'gauge'
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = labelnames
+        self.metric_type = metric_type
+        REGISTRY.append(self)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            if not isinstance(labels, tuple):
+                labels = (labels,)
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Request latency per route', ('method', 'route', 'status')
+)
+LLM_REQUEST_DURATION = Histogram(
+    'llm_request_duration_seconds', 'gigachat_api call latency per endpoint', ('endpoint', 'status')
+)
+LLM_BACKEND_TOTAL_TIME = Histogram(
+    'llm_backend_total_time_seconds', 'total_time reported by gigachat_api', ('endpoint',)
+)
+LLM_BACKEND_GIGACHAT_TIME = Histogram(
+    'llm_backend_gigachat_time_seconds', 'gigachat_time reported by gigachat_api', ('endpoint',)
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'Database statement time per statement label', ('statement',)
+)
+DB_POOL_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection', (),
+    (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+LLM_RESPONSES = Counter(
+    'llm_responses_total', 'Answered LLM requests by operation and from_cache', ('operation', 'from_cache')
+)
+LLM_TOKENS = Counter(
+    'llm_tokens_total', 'Tokens spent by operation and kind', ('operation', 'kind')
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    'llm_time_to_first_token_seconds', 'Time from request start to the first streamed token', ('endpoint',)
+)
+LLM_COALESCED = Counter(
+    'llm_coalesced_requests_total', 'Requests answered by joining an identical in-flight call', ('endpoint',)
+)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streaming responses are not buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                scope['method'],
+                route.path if route is not None else 'unmatched',
+                status_code
+            )
+
+
+STATEMENT_LABEL = re.compile(r'^\s*(\w+).*?\b(?:FROM|INTO|UPDATE)\s+"?(\w+)', re.IGNORECASE | re.DOTALL)
+_statement_labels: dict[str, str] = {}
+
+
+def statement_label(statement: str) -> str:
+    label = _statement_labels.get(statement)
+    if label is None:
+        match = STATEMENT_LABEL.match(statement)
+        if match:
+            label = f'{match.group(1).upper()} {match.group(2)}'
+        else:
+            label = statement.split(None, 1)[0].upper() if statement.strip() else 'EMPTY'
+        if len(_statement_labels) < 1000:
+            _statement_labels[statement] = label
+    return label
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_DURATION.observe(time.perf_counter() - conn.info['query_start'].pop(), statement_label(statement))
+
+    @event.listens_for(engine.sync_engine, 'handle_error')
+    def handle_error(context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,48 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.monitoring.metrics import Gauge, render_metrics
+from src.llm_service.cache import answer_cache
+from src.llm_service.test_pool import test_pool
+from src.llm_service.statistics import statistics_writer
+from src.services.llm_client import llm_client
+from src.auth.cache import user_cache
+from database.database import engine
+
+
+router = APIRouter()
+
+Gauge('answer_cache_hits_total', 'get_answer cache hits', lambda: answer_cache.hits, metric_type='counter')
+Gauge('answer_cache_misses_total', 'get_answer cache misses', lambda: answer_cache.misses, metric_type='counter')
+Gauge('user_cache_hits_total', 'Authenticated users served from the user cache', lambda: user_cache.hits,
+      metric_type='counter')
+Gauge('user_cache_misses_total', 'Authenticated users loaded from the db', lambda: user_cache.misses,
+      metric_type='counter')
+Gauge('db_pool_connections', 'Pooled database connections by state',
+      lambda: {(state,): engine.pool.stats()[state] for state in ('checked_out', 'idle', 'overflow')}, ('state',))
+Gauge('test_pool_depth', 'Pre-generated tests per doc', test_pool.depth, ('doc',))
+Gauge('statistics_queue_depth', 'Statistic rows waiting to be written', statistics_writer.depth)
+Gauge('statistics_written_rows_total', 'Statistic rows written', lambda: statistics_writer.written_rows,
+      metric_type='counter')
+Gauge('statistics_dropped_rows_total', 'Statistic rows dropped', lambda: statistics_writer.dropped_rows,
+      metric_type='counter')
+Gauge('statistics_failed_batches_total', 'Statistic batches that failed to write',
+      lambda: statistics_writer.failed_batches, metric_type='counter')
+Gauge('llm_concurrency_limit', 'Adaptive concurrency limit per LLM call class',
+      lambda: {name: int(limiter.limit) for name, limiter in llm_client.limiters.items()}, ('class',))
+Gauge('llm_in_flight', 'LLM calls in flight per class',
+      lambda: {name: limiter.in_flight for name, limiter in llm_client.limiters.items()}, ('class',))
+Gauge('llm_queued', 'LLM calls waiting for a slot per class',
+      lambda: {name: limiter.queued() for name, limiter in llm_client.limiters.items()}, ('class',))
+Gauge('llm_rejected_total', 'LLM calls rejected with 503 per class and reason',
+      lambda: {
+          **{(name, 'overloaded'): limiter.rejected for name, limiter in llm_client.limiters.items()},
+          **{(name, 'circuit_open'): breaker.rejected for name, breaker in llm_client.breakers.items()}
+      }, ('class', 'reason'), metric_type='counter')
+Gauge('llm_circuit_open', 'Whether the circuit breaker of a class rejects calls',
+      lambda: {name: int(breaker.state != 'closed') for name, breaker in llm_client.breakers.items()}, ('class',))
+
+
+@router.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type='text/plain; version=0.0.4')
@@ -0,0 +1,151 @@
+import asyncio
+import importlib.util
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from config.config import (LLM_API_URL, LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS, LLM_KEEPALIVE_EXPIRY,
+                           LLM_CONNECT_TIMEOUT, LLM_HTTP2, LLM_TIMEOUTS, LLM_DEFAULT_TIMEOUT, LLM_LIMIT_CLASSES,
+                           LLM_LIMITS, LLM_LIMIT_MIN, LLM_LIMIT_BACKOFF, LLM_LIMIT_QUEUE_SIZE, LLM_LIMIT_QUEUE_TIMEOUT,
+                           LLM_BREAKER_WINDOW, LLM_BREAKER_MIN_CALLS, LLM_BREAKER_FAILURE_RATE,
+                           LLM_BREAKER_SLOW_FACTOR, LLM_BREAKER_OPEN_SECONDS)
+from config.logs import doc_info
+from src.monitoring.metrics import LLM_REQUEST_DURATION
+from src.services.llm_limiter import AdaptiveLimiter, CircuitBreaker
+
+
+class LLMCall:
+    """Outcome of a call made in LLMClient.slot(), the caller sets ok=False for a failed response."""
+
+    def __init__(self):
+        self.ok = True
+
+
+class LLMClient:
+    """App-lifetime pooled client for gigachat_api."""
+
+    def __init__(self, base_url: str = LLM_API_URL):
+        self.base_url = base_url
+        self._client: httpx.AsyncClient | None = None
+        self.limiters = {
+            limit_class: AdaptiveLimiter(
+                name=limit_class,
+                initial_limit=initial_limit,
+                min_limit=LLM_LIMIT_MIN,
+                max_limit=max_limit,
+                latency_target=latency_target,
+                backoff=LLM_LIMIT_BACKOFF,
+                queue_size=LLM_LIMIT_QUEUE_SIZE,
+                queue_timeout=LLM_LIMIT_QUEUE_TIMEOUT
+            )
+            for limit_class, (initial_limit, max_limit, latency_target) in LLM_LIMITS.items()
+        }
+        self.breakers = {
+            limit_class: CircuitBreaker(
+                name=limit_class,
+                window=LLM_BREAKER_WINDOW,
+                min_calls=LLM_BREAKER_MIN_CALLS,
+                failure_rate=LLM_BREAKER_FAILURE_RATE,
+                open_seconds=LLM_BREAKER_OPEN_SECONDS
+            )
+            for limit_class in LLM_LIMITS
+        }
+
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = LLM_HTTP2
+        if http2 and importlib.util.find_spec('h2') is None:
+            doc_info.warning('LLM_HTTP2 is set but "h2" is not installed, falling back to HTTP/1.1')
+            http2 = False
+
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(LLM_DEFAULT_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # created lazily, so check_doc_table can use it before the app starts
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def start(self) -> None:
+        self.client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def timeout(endpoint: str) -> httpx.Timeout:
+        return httpx.Timeout(LLM_TIMEOUTS.get(endpoint, LLM_DEFAULT_TIMEOUT), connect=LLM_CONNECT_TIMEOUT)
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str):
+        """
+        Admission for one backend call: raises LLMUnavailable (503) when the breaker of the endpoint
+        class is open or its wait queue is full, and feeds the call outcome back to both.
+        """
+        limit_class = LLM_LIMIT_CLASSES.get(endpoint, 'other')
+        limiter, breaker = self.limiters[limit_class], self.breakers[limit_class]
+
+        breaker.before_call()
+        try:
+            started_at = await limiter.acquire()
+        except BaseException:
+            breaker.record(None)
+            raise
+
+        call = LLMCall()
+        ok = None
+        try:
+            yield call
+            ok = call.ok
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            limiter.release(started_at, ok)
+            slow = time.monotonic() - started_at > limiter.latency_target * LLM_BREAKER_SLOW_FACTOR
+            breaker.record(ok and not slow if ok is not None else None)
+
+    async def post(self, endpoint: str, **kwargs) -> httpx.Response:
+        kwargs.setdefault('timeout', self.timeout(endpoint))
+        async with self.slot(endpoint) as call:
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                response = await self.client.post(f'/{endpoint}', **kwargs)
+                status = response.status_code
+                call.ok = status < 500
+                return response
+            finally:
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - start, endpoint, status)
+
+    @asynccontextmanager
+    async def stream(self, endpoint: str, **kwargs):
+        """Streaming POST, the slot is held until the response is closed."""
+        kwargs.setdefault('timeout', self.timeout(endpoint))
+        async with self.slot(endpoint) as call:
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                async with self.client.stream('POST', f'/{endpoint}', **kwargs) as response:
+                    status = response.status_code
+                    call.ok = status < 500
+                    yield response
+            finally:
+                LLM_REQUEST_DURATION.observe(time.perf_counter() - start, endpoint, status)
+
+
+llm_client = LLMClient()
@@ -0,0 +1,153 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+from fastapi import HTTPException, status
+
+
+class LLMUnavailable(HTTPException):
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={'Retry-After': str(max(math.ceil(retry_after), 1))}
+        )
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit with a bounded wait queue.
+
+    A call finished within the latency target grows the limit by 1/limit (about +1 per limit calls),
+    a failed or slow one multiplies it by `backoff`. Only calls started after the last decrease can
+    decrease it again, so one slow burst shrinks the limit once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        backoff: float,
+        queue_size: int,
+        queue_timeout: float
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> float:
+        """Takes a slot and returns the call start time for release()."""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return time.monotonic()
+
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            raise LLMUnavailable(f'LLM backend is overloaded ({self.name})', self.queue_timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # the slot was handed over just before we gave up
+                self._release_slot()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise LLMUnavailable(f'LLM backend is overloaded ({self.name})', self.queue_timeout)
+            raise
+        return time.monotonic()
+
+    def release(self, started_at: float, ok: bool | None) -> None:
+        """ok=None (cancelled call) frees the slot without adjusting the limit."""
+        if ok is not None:
+            latency = time.monotonic() - started_at
+            if ok and latency <= self.latency_target:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            elif started_at >= self._last_decrease:
+                self.limit = max(self.limit * self.backoff, self.min_limit)
+                self._last_decrease = time.monotonic()
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class CircuitBreaker:
+    """
+    Opens when at least `failure_rate` of the last `window` calls failed, then rejects calls
+    for `open_seconds`. After that one probe call is let through: success closes the breaker,
+    failure opens it again.
+    """
+
+    def __init__(self, name: str, window: int, min_calls: int, failure_rate: float, open_seconds: float):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._probing = False
+
+    def before_call(self) -> None:
+        if self.state == 'open':
+            remaining = self.opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                self.rejected += 1
+                raise LLMUnavailable(f'LLM backend is unavailable ({self.name})', remaining)
+            self.state = 'half_open'
+
+        if self.state == 'half_open':
+            if self._probing:
+                self.rejected += 1
+                raise LLMUnavailable(f'LLM backend is unavailable ({self.name})', 1)
+            self._probing = True
+
+    def record(self, ok: bool | None) -> None:
+        if self.state == 'half_open':
+            self._probing = False
+            if ok:
+                self.state = 'closed'
+                self._outcomes.clear()
+            elif ok is False:
+                self._open()
+            return
+
+        if ok is None:
+            return
+        self._outcomes.append(ok)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self._outcomes.clear()